@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core.metrics import registry
+
+
+api_router = APIRouter(prefix="/metrics", tags=["监控"])
+
+@api_router.get("", response_class=PlainTextResponse, summary="运行指标")
+async def metrics():
+    """
+    Prometheus文本格式的运行指标
+    """
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,46 @@
+from typing import Optional
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+from app.api.deps import response_wrapper
+from app.core.errors import BusinessError
+from app.core.tracing import tracer
+from app.core.profiler import profile
+
+
+api_router = APIRouter(prefix="/admin", tags=["诊断接口"])
+
+@api_router.get("/profile", response_class=PlainTextResponse)
+async def admin_profile(
+    seconds: float = Query(10, gt=0, le=300, description="采样时长(秒)"),
+    interval: float = Query(0.005, ge=0.001, le=1, description="采样间隔(秒)")
+):
+    """
+    对运行中的进程采样，返回flamegraph兼容的折叠栈
+    """
+    try:
+        return PlainTextResponse(await profile(seconds, interval))
+    except RuntimeError as e:
+        raise BusinessError(str(e), code=409)
+
+@api_router.get("/spans")
+@response_wrapper
+async def admin_spans(
+    limit: int = Query(50, ge=0, le=1000, description="返回最近span的数量"),
+    name: Optional[str] = Query(None, description="按名称前缀过滤")
+):
+    """
+    获取各阶段耗时汇总和最近的span
+    """
+    return {
+        "stats": tracer.stats(),
+        "recent": tracer.recent(limit, name)
+    }
+
+@api_router.delete("/spans")
+@response_wrapper
+async def admin_spans_reset():
+    """
+    清空span统计
+    """
+    tracer.reset()
+    return True
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 from app.api.deps import response_wrapper
-from app.core.scanner import start
+from app.core.scanner import start, spool_status, status
 
 
 api_router = APIRouter(tags=["Scanner API"])
@@ -12,3 +12,22 @@ async def control_start():
     启动Scanner
     """
     return await start()
+
+
+@api_router.get("/control/spool")
+@response_wrapper
+async def control_spool():
+    """
+    获取提交失败批次的spool积压情况
+    """
+    return await spool_status()
+
+
+
+@api_router.get("/control/status")
+@response_wrapper
+async def control_status():
+    """
+    获取扫描器运行状态，多进程模式下包含各工作进程的分片、存活和重启次数
+    """
+    return await status()
@@ -0,0 +1,47 @@
+import gzip
+import asyncio
+from typing import Dict, Optional, Tuple
+from app.core.logger import log
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+
+class BodyCompressor:
+    """请求体压缩
+
+    请求体达到min_size时按algorithm(gzip/zstd)压缩并返回对应的Content-Encoding请求头，
+    未安装zstandard时zstd回退为gzip。压缩在线程中执行，避免阻塞事件循环。
+    """
+
+    def __init__(self, algorithm: Optional[str] = None, level: Optional[int] = None, min_size: int = 64 * 1024):
+        algorithm = (algorithm or "").lower() or None
+        if algorithm not in (None, "gzip", "zstd"):
+            log.warning(f"不支持的压缩算法: {algorithm}，已禁用请求体压缩")
+            algorithm = None
+        if algorithm == "zstd" and not ZSTD_AVAILABLE:
+            log.warning("未安装zstandard，请求体压缩回退为gzip")
+            algorithm = "gzip"
+        self.algorithm = algorithm
+        self.level = level
+        self.min_size = min_size
+
+    @property
+    def enabled(self) -> bool:
+        return self.algorithm is not None
+
+    def _compress(self, body: bytes | bytearray) -> bytes:
+        if self.algorithm == "zstd":
+            return zstandard.ZstdCompressor(level=self.level or 3).compress(body)
+        return gzip.compress(body, compresslevel=self.level or 6, mtime=0)
+
+    async def compress(self, body: bytes | bytearray) -> Tuple[bytes | bytearray, Dict[str, str]]:
+        """返回(请求体, 额外请求头)"""
+        if not self.enabled or len(body) < self.min_size:
+            return body, {}
+        compressed = await asyncio.to_thread(self._compress, body)
+        return compressed, {"Content-Encoding": self.algorithm}
@@ -245,6 +245,13 @@ class _ConfigManager:
                 return default
         return value
 
+    def update(self, values: Dict[str, Any]):
+        """
+        合并配置到内存，不写入文件和环境变量
+        用于把运行时配置传递给子进程
+        """
+        self._config = self._merge_configs(self._config, values)
+
     def get_all(self) -> Dict[str, Any]:
         """获取所有配置"""
         return self._config.copy()
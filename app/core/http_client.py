@@ -1,15 +1,33 @@
 import httpx
 from dataclasses import dataclass
 from app.core.logger import log
-from typing import Optional, Dict, Any, Union
+from app.core.serialization import loads
+from app.core.tracing import span
+from typing import Optional, Dict, Any, Union, ClassVar
+
+try:
+    import h2  # noqa: F401  httpx的HTTP/2支持依赖h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 @dataclass
 class HttpConfig:
     """HTTP客户端配置"""
-    timeout: int = 3600  # 默认超时时间1小时
+    timeout: int = 3600  # 读超时，默认1小时
+    connect_timeout: float = 10  # 建立连接超时
+    write_timeout: float = 60  # 发送请求体超时
+    pool_timeout: float = 60  # 等待连接池空闲连接超时
+    http2: bool = False  # 启用HTTP/2多路复用
+    max_connections: int = 100  # 连接池最大连接数
+    max_keepalive_connections: int = 20  # 最大保持空闲连接数
+    keepalive_expiry: float = 30  # 空闲连接保持时间
+    shared: bool = True  # 同一base_url的客户端共享底层连接池
 
 class HttpClient:
     """HTTP客户端封装"""
+    _shared_clients: ClassVar[Dict[str, httpx.AsyncClient]] = {}
+
     def __init__(self, base_url: str, config: Optional[HttpConfig] = None):
         self.base_url = base_url.rstrip('/')
         self.config = config or HttpConfig()
@@ -22,33 +40,69 @@ class HttpClient:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.close()
 
+    def _create_client(self) -> httpx.AsyncClient:
+        http2 = self.config.http2
+        if http2 and not HTTP2_AVAILABLE:
+            log.warning("未安装h2，HTTP/2已禁用")
+            http2 = False
+        return httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(
+                connect=self.config.connect_timeout,
+                read=self.config.timeout,
+                write=self.config.write_timeout,
+                pool=self.config.pool_timeout
+            ),
+            limits=httpx.Limits(
+                max_connections=self.config.max_connections,
+                max_keepalive_connections=self.config.max_keepalive_connections,
+                keepalive_expiry=self.config.keepalive_expiry
+            ),
+            verify=False  # 如果需要禁用SSL验证
+        )
+
     async def ensure_client(self):
-        """确保client已创建"""
-        if self._client is None:
-            self._client = httpx.AsyncClient(
-                timeout=httpx.Timeout(self.config.timeout),
-                verify=False  # 如果需要禁用SSL验证
-            )
+        """确保client已创建，共享模式下同一base_url复用同一个client"""
+        if self._client is not None and not self._client.is_closed:
+            return
+        if not self.config.shared:
+            self._client = self._create_client()
+            return
+        client = self._shared_clients.get(self.base_url)
+        if client is None or client.is_closed:
+            client = self._create_client()
+            self._shared_clients[self.base_url] = client
+        self._client = client
 
     async def close(self):
-        """关闭client"""
+        """关闭client，共享的client只释放引用，由close_shared统一关闭"""
         if self._client:
-            await self._client.aclose()
+            if not self.config.shared:
+                await self._client.aclose()
             self._client = None
 
+    @classmethod
+    async def close_shared(cls):
+        """关闭所有共享的client"""
+        clients = list(cls._shared_clients.values())
+        cls._shared_clients.clear()
+        for client in clients:
+            await client.aclose()
+
     async def request(self, method: str, endpoint: str, **kwargs) -> Union[Dict[str, Any], bytes, str]:
         """发送HTTP请求"""
         url = f"{self.base_url}/{endpoint.lstrip('/')}"
         await self.ensure_client()
         # 确保 self._client 不为 None 后再调用 request 方法
         if self._client:
-            response = await self._client.request(method, url, **kwargs)
+            with span(f"http.{method} {endpoint.lstrip('/')}"):
+                response = await self._client.request(method, url, **kwargs)
         else:
             raise RuntimeError("HTTP client is not initialized")
         response.raise_for_status()
         content_type = response.headers.get('content-type', '')
         if 'application/json' in content_type:
-            data = response.json()
+            data = loads(response.content)
         elif 'application/octet-stream' in content_type:
             data = response.read()
         else:
@@ -0,0 +1,250 @@
+"""
+Prometheus格式的运行指标
+
+指标只在事件循环线程中更新，计数直接累加，不加锁。
+带标签的指标子项在首次使用时创建并缓存，热路径上应保存 labels() 返回的子项重复使用。
+其他进程(扫描工作进程)的指标以 snapshot() 的形式传回，通过 add_source 注册后随本进程的指标一起输出。
+"""
+import math
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# 指标快照: (类型, 说明, 桶边界, [(标签名, 标签值, 取值)])，直方图的取值为 (各桶计数, sum, count)
+Snapshot = Tuple[str, str, Optional[Tuple[float, ...]], List[Tuple[Tuple[str, ...], Tuple[str, ...], object]]]
+
+
+def _render_snapshot(name: str, snapshot: Snapshot) -> List[str]:
+    kind, documentation, buckets, samples = snapshot
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+    for names, values, value in samples:
+        if kind == "histogram":
+            counts, total, count = value
+            cumulative = 0
+            for bound, bucket in zip(buckets + (math.inf,), counts):
+                cumulative += bucket
+                labels = _format_labels(names, values, f'le="{_format_value(float(bound))}"')
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            labels = _format_labels(names, values)
+            lines.append(f"{name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{name}_count{labels} {count}")
+        else:
+            lines.append(f"{name}{_format_labels(names, values)} {_format_value(value)}")
+    return lines
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # 最后一个桶为+Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricFamily:
+    """同名指标及其按标签区分的子项"""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Iterable[str] = (), buckets: Optional[Tuple[float, ...]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) if buckets else None
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self._create()
+
+    def _create(self):
+        if self.kind == "counter":
+            return Counter()
+        if self.kind == "gauge":
+            return Gauge()
+        return Histogram(self.buckets)
+
+    def labels(self, *values) -> object:
+        """获取标签值对应的子项，标签值为字符串时直接命中缓存"""
+        child = self._children.get(values)
+        if child is None:
+            values = tuple(str(value) for value in values)
+            child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = self._create()
+        return child
+
+    # 无标签指标直接调用
+    def inc(self, amount: float = 1):
+        self._default.inc(amount)
+
+    def set(self, value: float):
+        self._default.set(value)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def samples(self) -> Iterable[Tuple[Tuple[str, ...], object]]:
+        if not self.labelnames:
+            return [((), self._default)]
+        return list(self._children.items())
+
+    def snapshot(self) -> Snapshot:
+        samples = [
+            (self.labelnames, values, (list(child.counts), child.sum, child.count) if self.kind == "histogram" else child.value)
+            for values, child in self.samples()
+        ]
+        return self.kind, self.documentation, self.buckets, samples
+
+    def render(self) -> List[str]:
+        return _render_snapshot(self.name, self.snapshot())
+
+
+class CallbackGauge:
+    """抓取时通过回调计算的指标，回调返回[(标签值, 数值)]"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str], callback: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def snapshot(self) -> Snapshot:
+        return "gauge", self.documentation, None, [(self.labelnames, tuple(values), value) for values, value in self.callback()]
+
+    def render(self) -> List[str]:
+        return _render_snapshot(self.name, self.snapshot())
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._sources: List[Tuple[str, Callable[[], Iterable[Tuple[str, Dict[str, Snapshot]]]]]] = []
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily(name, documentation, "counter", labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> MetricFamily:
+        return self._register(MetricFamily(name, documentation, "gauge", labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets: Tuple[float, ...] = ()) -> MetricFamily:
+        return self._register(MetricFamily(name, documentation, "histogram", labelnames, buckets))
+
+    def callback_gauge(self, name: str, documentation: str, labelnames: Iterable[str], callback) -> CallbackGauge:
+        metric = CallbackGauge(name, documentation, labelnames, callback)
+        self._metrics[name] = metric
+        return metric
+
+    def add_source(self, label: str, callback: Callable[[], Iterable[Tuple[str, Dict[str, Snapshot]]]]):
+        """注册其他进程的指标来源
+        
+        callback返回 [(来源标识, snapshot())]，输出时各来源的指标加上 label=来源标识 的标签，
+        与本进程的同名指标合并在同一个指标族下。
+        """
+        self._sources.append((label, callback))
+
+    def snapshot(self) -> Dict[str, Snapshot]:
+        """本进程全部指标的当前取值，只含基本类型，可以跨进程传递"""
+        result = {}
+        for metric in self._metrics.values():
+            try:
+                result[metric.name] = metric.snapshot()
+            except Exception as e:
+                result[metric.name] = ("untyped", f"采集失败: {str(e)}", None, [])
+        return result
+
+    def render(self) -> str:
+        families = self.snapshot()
+        for label, callback in self._sources:
+            try:
+                sources = list(callback())
+            except Exception:
+                continue
+            for source, snapshot in sources:
+                for name, (kind, documentation, buckets, samples) in snapshot.items():
+                    family = families.setdefault(name, (kind, documentation, buckets, []))
+                    if family[0] != kind or family[2] != buckets:
+                        continue
+                    family[3].extend(((*names, label), (*values, source), value) for names, values, value in samples)
+        lines = []
+        for name, family in families.items():
+            lines.extend(_render_snapshot(name, family))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# 时延类指标的桶(秒)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CYCLE_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 3600)
+BYTES_BUCKETS = (1024, 16 * 1024, 128 * 1024, 1024 ** 2, 2 * 1024 ** 2, 5 * 1024 ** 2, 10 * 1024 ** 2, 20 * 1024 ** 2)
+RECORDS_BUCKETS = (10, 100, 1000, 5000, 10000, 20000, 50000, 100000)
+
+SCAN_CYCLE_SECONDS = registry.histogram("scanner_cycle_duration_seconds", "NDS扫描周期耗时", ["nds"], CYCLE_BUCKETS)
+FILES_LISTED = registry.counter("scanner_files_listed_total", "网关列出的文件数", ["nds", "data_type"])
+NEW_FILES = registry.counter("scanner_new_files_total", "过滤后需要扫描子包的新文件数", ["nds", "data_type"])
+FILES_OUT_OF_WINDOW = registry.counter("scanner_files_out_of_window_total", "时间窗口外被跳过的文件数", ["nds", "data_type", "reason"])
+ENTRIES_SUBMITTED = registry.counter("scanner_entries_submitted_total", "成功提交的子包记录数", ["nds"])
+BATCH_BYTES = registry.histogram("scanner_batch_bytes", "提交批次的请求体字节数", (), BYTES_BUCKETS)
+BATCH_RECORDS = registry.histogram("scanner_batch_records", "提交批次的记录数", (), RECORDS_BUCKETS)
+BATCH_REJECTED = registry.counter("scanner_batch_rejected_total", "后端返回429的批次数")
+ERRORS = registry.counter("scanner_errors_total", "扫描过程中的错误数", ["stage"])
+ZIP_INFO_CACHE = registry.counter("scanner_zip_info_cache_total", "zip_info缓存命中情况", ["result"])
+WORKER_RESTARTS = registry.counter("scanner_worker_restarts_total", "扫描工作进程重启次数", ["worker"])
+GATEWAY_LATENCY = registry.histogram("gateway_request_duration_seconds", "网关请求耗时", ["api"], LATENCY_BUCKETS)
@@ -0,0 +1,57 @@
+"""
+采样分析器
+
+在后台线程中按固定间隔采样目标线程(默认事件循环线程)的调用栈，
+输出flamegraph.pl / speedscope 可直接读取的折叠栈格式:
+    module:function;module:function 采样次数
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+from collections import Counter
+from typing import Optional
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__") or os.path.basename(code.co_filename)
+    return f"{module}:{code.co_name}"
+
+
+def _sample(thread_id: int, seconds: float, interval: float) -> Counter:
+    stacks: Counter = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        frame = sys._current_frames().get(thread_id)
+        if frame is None:
+            break
+        names = []
+        while frame is not None:
+            names.append(_frame_name(frame))
+            frame = frame.f_back
+        stacks[";".join(reversed(names))] += 1
+        del frame
+        time.sleep(interval)
+    return stacks
+
+
+_lock = threading.Lock()
+
+
+async def profile(seconds: float = 10, interval: float = 0.005, thread_id: Optional[int] = None) -> str:
+    """采样seconds秒，返回折叠栈文本
+
+    :param seconds: 采样时长
+    :param interval: 采样间隔
+    :param thread_id: 目标线程，默认为调用方所在的事件循环线程
+    """
+    if not _lock.acquire(blocking=False):
+        raise RuntimeError("已有采样正在进行")
+    try:
+        thread_id = thread_id or threading.get_ident()
+        stacks = await asyncio.to_thread(_sample, thread_id, seconds, interval)
+    finally:
+        _lock.release()
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
@@ -1,9 +1,11 @@
 from app.core.logger import log
-from app.utils.server import Server
 from app.core.errors import NotFoundError
-from app.services.scanner import Scanner
-server = Server()
+from app.core.config import config
+from app.services.scanner import Scanner, server
+from app.services.coordinator import ScanCoordinator
 scanner = Scanner()
+# scanner.workers大于0时按NDS分片到多个工作进程扫描
+coordinator = ScanCoordinator(config.get("scanner.workers")) if int(config.get("scanner.workers", 0) or 0) > 0 else None
 async def start():
     """启动扫描器"""
     
@@ -23,10 +25,34 @@ async def start():
         if not gateway_nds or gateway_nds == []:
             raise ValueError("绑定网关DNS清单为空, 无法启动扫描器")
         
-        await scanner.start()
+        if coordinator:
+            await coordinator.start(server)
+        else:
+            await scanner.start()
         
         return response
     except Exception as e:
         log.error(f"扫描器启动失败: {str(e)}")
         raise ValueError(f"扫描器启动失败: {str(e)}")
-    
+
+
+async def spool_status():
+    """获取spool积压情况"""
+    if coordinator:
+        return coordinator.status()["spool"]
+    return scanner.spool_stats()
+
+
+async def status():
+    """获取扫描器运行状态，工作进程模式下为各工作进程的汇总"""
+    if coordinator:
+        return coordinator.status()
+    return scanner.status()
+
+
+async def stop():
+    """停止扫描器"""
+    if coordinator:
+        await coordinator.stop()
+    else:
+        await scanner.stop()
@@ -0,0 +1,69 @@
+"""
+JSON序列化
+
+按 orjson > msgspec > 标准库json 的顺序选择可用的实现，
+可通过 json.backend 配置强制指定。输出统一为紧凑格式、UTF-8、不转义非ASCII字符。
+"""
+import json
+from typing import Any, Union
+from app.core.logger import log
+from app.core.config import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _select_backend() -> str:
+    available = {"orjson": orjson is not None, "msgspec": msgspec is not None, "json": True}
+    preferred = config.get("json.backend")
+    if preferred:
+        if available.get(preferred):
+            return preferred
+        log.warning(f"JSON实现不可用: {preferred}，自动选择")
+    return next(name for name, ok in available.items() if ok)
+
+
+BACKEND = _select_backend()
+
+if BACKEND == "orjson":
+    def dumpb(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        return orjson.loads(data)
+
+elif BACKEND == "msgspec":
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+
+    def dumpb(obj: Any) -> bytes:
+        return _encoder.encode(obj)
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        return _decoder.decode(data)
+
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def dumpb(obj: Any) -> bytes:
+        return _encoder.encode(obj).encode("utf-8")
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+
+def dumps(obj: Any) -> str:
+    """序列化为字符串"""
+    return dumpb(obj).decode("utf-8")
+
+
+__all__ = ["BACKEND", "dumpb", "dumps", "loads"]
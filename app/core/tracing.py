@@ -0,0 +1,176 @@
+"""
+轻量级阶段耗时追踪
+
+用法:
+```python
+with span("scan.list", nds=1, data_type="MRO"):
+    ...
+async with span("scan.zip_info"), other_async_context():
+    ...
+```
+每个阶段按名称汇总次数、总耗时、最大耗时，并保留最近的耗时样本用于计算分位数，
+最近完成的span保留在环形缓冲区中供排查慢周期。
+每个请求都会记录的高频阶段用 tracer.observe()，只汇总耗时，按 tracing.sample_rate 抽样进入环形缓冲区；
+未启用时 span() 返回共用的空span，不产生分配。
+"""
+import time
+import random
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Union
+from app.core.config import config
+
+
+class SpanStats:
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self, sample_size: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=sample_size)
+
+    def add(self, duration: float):
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        self.samples.append(duration)
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total": round(self.total, 6),
+            "avg": round(self.total / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+            "p50": round(self.percentile(0.5), 6),
+            "p99": round(self.percentile(0.99), 6),
+        }
+
+
+class Tracer:
+    def __init__(self, enabled: bool = True, sample_size: int = 2048, recent_size: int = 256, sample_rate: float = 0.01):
+        self.enabled = enabled
+        self.sample_size = sample_size
+        self.sample_rate = sample_rate  # observe()记录的阶段进入环形缓冲区的比例
+        self._stats: Dict[str, SpanStats] = {}
+        self._recent: Deque["Span"] = deque(maxlen=recent_size)
+
+    def _stats_for(self, name: str) -> SpanStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = SpanStats(self.sample_size)
+        return stats
+
+    def record(self, span: "Span"):
+        self._stats_for(span.name).add(span.duration)
+        self._recent.append(span)
+
+    def add(self, name: str, duration: float, **attrs):
+        """记录一个已在别处计时的阶段"""
+        if not self.enabled:
+            return
+        item = Span(self, name, attrs)
+        item.duration = duration
+        self.record(item)
+
+    def observe(self, name: str, duration: float):
+        """记录高频阶段的耗时，只有抽中的才创建span进入环形缓冲区"""
+        if not self.enabled:
+            return
+        self._stats_for(name).add(duration)
+        if self.sample_rate > 0 and (self.sample_rate >= 1 or random.random() < self.sample_rate):
+            item = Span(self, name, {})
+            item.duration = duration
+            self._recent.append(item)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各阶段耗时汇总(秒)"""
+        return {name: stats.to_dict() for name, stats in sorted(self._stats.items())}
+
+    def recent(self, limit: int = 50, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """最近完成的span，最新的在前"""
+        result = []
+        for span in reversed(self._recent):
+            if name and not span.name.startswith(name):
+                continue
+            result.append(span.to_dict())
+            if len(result) >= limit:
+                break
+        return result
+
+    def reset(self):
+        self._stats.clear()
+        self._recent.clear()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "attrs", "start", "duration", "error")
+
+    def __init__(self, tracer: Tracer, name: str, attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.duration = 0.0
+        self.error = None
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        if self.tracer.enabled:
+            self.tracer.record(self)
+        return False
+
+    async def __aenter__(self) -> "Span":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return self.__exit__(exc_type, exc_val, exc_tb)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {"name": self.name, "duration": round(self.duration, 6), **self.attrs}
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+class NullSpan:
+    """未启用追踪时的空span"""
+
+    def __enter__(self) -> "NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    async def __aenter__(self) -> "NullSpan":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_null_span = NullSpan()
+
+tracer = Tracer(
+    enabled=config.get("tracing.enabled", True),
+    sample_rate=float(config.get("tracing.sample_rate", 0.01))
+)
+
+
+def span(name: str, **attrs) -> Union[Span, NullSpan]:
+    """创建一个阶段span，配合with使用"""
+    if not tracer.enabled:
+        return _null_span
+    return Span(tracer, name, attrs)
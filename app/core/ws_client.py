@@ -1,11 +1,21 @@
-import json
+import mmap
+import time
 import asyncio
+import weakref
+import tempfile
 import websockets
 from uuid import uuid4
 from dataclasses import dataclass, asdict, field
 from websockets.exceptions import ConnectionClosed
-from typing import Optional, Dict, Any, List, Literal
+from typing import Optional, Dict, Any, List, Literal, Union, AsyncIterator
 from app.core.logger import log
+from app.core.serialization import dumps, loads
+from app.core.metrics import registry, GATEWAY_LATENCY
+from app.core.tracing import tracer
+
+
+# 分帧传输时每个二进制帧前缀的request_id长度(uuid4().hex)
+FRAME_HEADER_SIZE = 32
 
 
 @dataclass
@@ -15,7 +25,7 @@ class WebSocketRequest:
     request_id: str = field(default_factory=lambda: uuid4().hex)
 
     def __str__(self) -> str:
-        return json.dumps(asdict(self))
+        return dumps(asdict(self))
 
 
 @dataclass
@@ -25,7 +35,7 @@ class WebSocketResponse(Exception):
     message: str = "success"
     data: Optional[Dict[str, Any]] = None
     request_id: Optional[str] = None
-    Bytes: Optional[bytes] = None
+    Bytes: Optional[Union[bytes, bytearray, mmap.mmap, memoryview]] = None
 
     def __post_init__(self):
         super().__init__(self.message)
@@ -39,7 +49,7 @@ class WebSocketResponse(Exception):
         }
         if self.data is not None:
             result["data"] = self.data
-        return json.dumps(result, ensure_ascii=False)
+        return dumps(result)
 
     @property
     def success(self) -> bool:
@@ -54,38 +64,158 @@ class WebSocketResponse(Exception):
     def to_dict(self) -> Dict[str, Any]:
         return asdict(self)
 
+    def close(self):
+        """释放落盘文件数据的mmap映射"""
+        if isinstance(self.Bytes, mmap.mmap):
+            self.Bytes.close()
+
+
+# 所有客户端实例，用于采集待响应请求数
+_clients: "weakref.WeakSet[WebSocketClient]" = weakref.WeakSet()
+
+registry.callback_gauge(
+    "websocket_pending_requests",
+    "WebSocket待响应请求数",
+    ["client"],
+    lambda: [((client.client_id,), client.pending) for client in list(_clients)]
+)
+
+
+class FileTransfer:
+    """单个请求的文件传输状态
+
+    请求声明了数据大小时直接写入预分配的bytearray，超过spill_threshold时写入临时文件，
+    结束后以只读mmap返回，避免分块拼接带来的额外拷贝和双倍内存；未声明大小时按分块收集后拼接。
+    调用方提供destination时直接写入该缓冲区(如分段读取时整个文件缓冲区中对应的区间)。
+    流式请求的数据不在此缓存，直接放入stream队列交给消费者。
+    """
+
+    def __init__(self, request_id: str, framed: bool = False, size: Optional[int] = None,
+                 spill_threshold: Optional[int] = None, spill_dir: Optional[str] = None,
+                 stream: Optional[asyncio.Queue] = None, destination: Optional[memoryview] = None):
+        self.request_id = request_id
+        self.framed = framed  # 二进制帧是否带request_id前缀
+        self.stream = stream
+        self.received = 0
+        self.chunks: List[Union[bytes, bytearray, memoryview]] = []
+        self._buffer: Optional[bytearray] = None
+        self._view: Optional[memoryview] = None
+        self._destination: Optional[memoryview] = None  # 调用方持有，不在此释放
+        self._file = None
+        if stream is not None:
+            pass
+        elif destination is not None:
+            self._destination = self._view = destination
+        elif size and spill_threshold is not None and size > spill_threshold:
+            self._file = tempfile.TemporaryFile(dir=spill_dir)
+        elif size:
+            self._buffer = bytearray(size)
+            self._view = memoryview(self._buffer)
+
+    async def put(self, data: Union[bytes, memoryview]):
+        """流式请求: 队列满时等待消费者"""
+        self.received += len(data)
+        await self.stream.put(data)
+
+    def write(self, data: Union[bytes, memoryview]):
+        end = self.received + len(data)
+        if self._file is not None:
+            self._file.write(data)
+        elif self._view is not None and end <= len(self._view):
+            self._view[self.received:end] = data
+        else:
+            if self._destination is not None:
+                # 实际数据超过目标缓冲区，已接收部分复制为普通分块
+                self.chunks.append(self._view[:self.received].tobytes())
+                self._destination = self._view = None
+            elif self._view is not None:
+                # 实际数据超过声明大小，已接收部分转为普通分块
+                self._view.release()
+                self._view = None
+                del self._buffer[self.received:]
+                self.chunks.append(self._buffer)
+                self._buffer = None
+            self.chunks.append(data)
+        self.received = end
+
+    def result(self) -> Optional[Union[bytes, bytearray, mmap.mmap, memoryview]]:
+        """传输完成后的文件数据，没有收到数据时返回None"""
+        if not self.received:
+            return None
+        if self._file is not None:
+            self._file.flush()
+            data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.close()
+            return data
+        if self._destination is not None:
+            data, self._destination, self._view = self._destination, None, None
+            return data if self.received == len(data) else data[:self.received].tobytes()
+        if self._buffer is not None:
+            self._view.release()
+            self._view = None
+            data, self._buffer = self._buffer, None
+            if self.received < len(data):
+                del data[self.received:]
+            return data
+        return b"".join(self.chunks)
+
+    def close(self):
+        if self._view is not None and self._destination is None:
+            self._view.release()
+        self._view = None
+        self._destination = None
+        self._buffer = None
+        self.chunks.clear()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
 
 class WebSocketClient:
-    def __init__(self, base_url: str, client_id: Optional[str] = None):
+    def __init__(self, base_url: str, client_id: Optional[str] = None, heartbeat_interval: Optional[float] = 30.0,
+                 spill_threshold: Optional[int] = 64 * 1024 * 1024, spill_dir: Optional[str] = None):
         self.base_url = base_url.rstrip('/')
         self.client_id = client_id or uuid4().hex
         self.url = f"{self.base_url}/{self.client_id}"
+        self.heartbeat_interval = heartbeat_interval  # 心跳周期(秒)，为空或0时不发送心跳
+        self.spill_threshold = spill_threshold  # 超过该大小的文件数据写入临时文件，为空时始终使用内存
+        self.spill_dir = spill_dir
         self.ws = None
         self._receive_task = None
+        self._heartbeat_task = None
         self._running = False
         self._pending_requests: Dict[str, asyncio.Future] = {}
-        self._current_file_request = None
-        self._file_chunks: List[bytes] = []
+        self._file_transfers: Dict[str, FileTransfer] = {}  # 按request_id保存文件传输状态
+        self._current_file_request: Optional[str] = None  # 接收未分帧二进制数据的请求
+        self._framed_transfers = 0  # 进行中的分帧传输数
+        self._expected_sizes: Dict[str, int] = {}  # 请求声明的文件数据大小
+        self._destinations: Dict[str, memoryview] = {}  # 请求指定的文件数据写入位置
+        self._streams: Dict[str, asyncio.Queue] = {}  # 流式请求的数据队列，None表示结束
+        _clients.add(self)
+
+    @property
+    def connected(self) -> bool:
+        """连接状态由接收循环和关闭事件被动维护，不产生额外网络请求"""
+        return self._running and self.ws is not None and not self.ws.closed
 
     async def is_connected(self) -> bool:
-        if self.ws is None or self.ws.closed:
-            return False
-        
-        try:
-            await self.ws.send(str(WebSocketRequest(api="check_connection")))
-            return True
-        except Exception as e:
-            log.error(f"检查连接失败: {str(e)}")
-            return False
+        return self.connected
+
+    @property
+    def pending(self) -> int:
+        """待响应的请求数"""
+        return len(self._pending_requests)
 
     async def connect(self) -> None:
-        if await self.is_connected():
+        if self.connected:
             return
             
         try:
             self.ws = await websockets.connect(self.url)
             self._running = True
             self._receive_task = asyncio.create_task(self._message_handler())
+            if self.heartbeat_interval:
+                self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
         except Exception as e:
             log.error(f"WebSocket连接失败: {str(e)}")
             raise WebSocketResponse(type="error", code=400, message=f"WebSocket连接失败: {str(e)}")
@@ -95,11 +225,10 @@ class WebSocketClient:
             try:
                 message = await self.ws.recv()
                 if isinstance(message, bytes):
-                    if self._current_file_request:
-                        self._file_chunks.append(message)
+                    await self._handle_binary_message(message)
                     continue
 
-                data = json.loads(message)
+                data = loads(message)
                 
                 if data.get("type") == "check":
                     continue
@@ -118,124 +247,272 @@ class WebSocketClient:
                 break
             except Exception as e:
                 log.error(f"消息处理错误: {str(e)}")
+        if self._running:
+            # 对端关闭时握手可能已在后台完成，循环条件先于recv()发现连接关闭
+            log.warning("WebSocket连接已关闭")
+            await self._handle_connection_error()
+
+    async def _heartbeat_loop(self):
+        """定期发送check_connection，发送失败视为连接断开"""
+        while self.connected:
+            await asyncio.sleep(self.heartbeat_interval)
+            if not self.connected:
+                break
+            try:
+                await self.ws.send(str(WebSocketRequest(api="check_connection")))
+            except Exception as e:
+                log.warning(f"心跳发送失败: {str(e)}")
+                await self._handle_connection_error()
+                break
+
+    async def _handle_binary_message(self, message: bytes):
+        # 分帧数据按前缀路由到对应请求，其余数据归属当前文件请求
+        transfer = None
+        data = message
+        if self._framed_transfers and len(message) >= FRAME_HEADER_SIZE:
+            transfer = self._file_transfers.get(message[:FRAME_HEADER_SIZE].decode("latin-1"))
+            if transfer is not None and transfer.framed:
+                data = memoryview(message)[FRAME_HEADER_SIZE:]
+            else:
+                transfer = None
+        if transfer is None and self._current_file_request:
+            transfer = self._file_transfers.get(self._current_file_request)
+        if transfer is None:
+            return
+        if transfer.stream is not None:
+            # 消费者跟不上时在此等待，暂停读取该连接，由TCP窗口把背压传到网关
+            await transfer.put(data)
+        else:
+            transfer.write(data)
 
     async def _handle_file_message(self, data: Dict[str, Any]):
         request_id = data.get("request_id")
-        if not request_id:
+        if not request_id or request_id not in self._pending_requests:
             return
             
         if data.get("data") == "start":
-            self._current_file_request = request_id
-            self._file_chunks = []
+            self._close_transfer(request_id)
+            transfer = FileTransfer(
+                request_id=request_id,
+                framed=bool(data.get("framed")),
+                size=self._expected_sizes.get(request_id),
+                spill_threshold=self.spill_threshold,
+                spill_dir=self.spill_dir,
+                stream=self._streams.get(request_id),
+                destination=self._destinations.get(request_id)
+            )
+            self._file_transfers[request_id] = transfer
+            if transfer.framed:
+                self._framed_transfers += 1
+            else:
+                self._current_file_request = request_id
         elif data.get("data") == "end":
-            return
+            if self._current_file_request == request_id:
+                self._current_file_request = None
+
+    def _discard_transfer(self, request_id: Optional[str]) -> Optional[FileTransfer]:
+        """移除请求的文件传输状态"""
+        if self._current_file_request == request_id:
+            self._current_file_request = None
+        transfer = self._file_transfers.pop(request_id, None)
+        if transfer is not None and transfer.framed:
+            self._framed_transfers -= 1
+        return transfer
+
+    def _close_transfer(self, request_id: Optional[str]):
+        """丢弃请求未完成的文件传输并释放缓冲区"""
+        transfer = self._discard_transfer(request_id)
+        if transfer is not None:
+            transfer.close()
 
     async def _handle_response_message(self, response: WebSocketResponse):
         if not response.request_id:
             return
             
         future = self._pending_requests.pop(response.request_id)
-        
+        transfer = self._discard_transfer(response.request_id)
+
+        if future.done():
+            # 请求已被取消(如扫描任务迁移到其他副本)，响应先于取消处理到达时直接丢弃
+            if transfer is not None:
+                transfer.close()
+            return
+
         if not response.success:
-            if response.request_id == self._current_file_request:
-                self._current_file_request = None
-                self._file_chunks = []
+            if transfer is not None:
+                transfer.close()
             future.set_exception(response)
+            self._end_stream(response.request_id)
+            return
+            
+        stream = self._streams.get(response.request_id)
+        if stream is not None:
+            await stream.put(None)
+            future.set_result(response)
             return
             
-        if response.request_id == self._current_file_request:
-            if not self._file_chunks:
+        if transfer is not None:
+            data = transfer.result()
+            if data is None:
+                transfer.close()
                 error_response = WebSocketResponse(type="error", code=403, message="文件传输异常: 没有收到文件数据", request_id=response.request_id)
                 future.set_exception(error_response)
                 return
                 
-            response.Bytes = b"".join(self._file_chunks)
-            self._current_file_request = None
-            self._file_chunks = []
+            response.Bytes = data
                 
         future.set_result(response)
 
+    def _end_stream(self, request_id: str):
+        """请求失败时结束流式队列，丢弃未消费的数据以保证结束标记能写入"""
+        stream = self._streams.get(request_id)
+        if stream is None:
+            return
+        while stream.full():
+            stream.get_nowait()
+        stream.put_nowait(None)
+
+    def _fail_pending_requests(self, message: str):
+        """以错误结束所有待处理请求，文件传输中的请求优先标记为传输中断"""
+        for request_id, future in self._pending_requests.items():
+            if future.done():
+                continue
+            if request_id in self._file_transfers:
+                future.set_exception(WebSocketResponse(type="error", code=404, message=f"文件传输中断: {message}", request_id=request_id))
+            else:
+                future.set_exception(WebSocketResponse(type="error", code=404, message=message, request_id=request_id))
+        self._pending_requests.clear()
+        for request_id in list(self._streams):
+            self._end_stream(request_id)
+        for transfer in self._file_transfers.values():
+            transfer.close()
+        self._file_transfers.clear()
+        self._current_file_request = None
+        self._framed_transfers = 0
+
     async def _handle_connection_error(self):
         self._running = False
         if self.ws:
             await self.ws.close()
             self.ws = None
             
-        # 优先处理文件传输中断
-        if self._current_file_request:
-            future = self._pending_requests.pop(self._current_file_request, None)
-            if future and not future.done():
-                future.set_exception(WebSocketResponse(type="error", code=404, message="文件传输中断: WebSocket连接已断开", request_id=self._current_file_request))
-            self._current_file_request = None
-            self._file_chunks = []
-            
-        # 处理其他待处理的请求
-        for request_id, future in self._pending_requests.items():
-            if not future.done():
-                future.set_exception(WebSocketResponse(type="error", code=404, message="WebSocket连接已断开", request_id=request_id))
-        self._pending_requests.clear()
+        self._fail_pending_requests("WebSocket连接已断开")
         
     async def close(self):
         self._running = False
         
-        # 先取消消息处理任务
-        if self._receive_task and not self._receive_task.done():
-            self._receive_task.cancel()
-            try:
-                await self._receive_task
-            except asyncio.CancelledError:
-                pass
+        # 先取消心跳和消息处理任务
+        for task in (self._heartbeat_task, self._receive_task):
+            if task and not task.done() and task is not asyncio.current_task():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
         
         # 处理所有待处理的请求
-        if self._current_file_request:
-            future = self._pending_requests.pop(self._current_file_request, None)
-            if future and not future.done():
-                future.set_exception(WebSocketResponse(type="error", code=404, message="文件传输中断: 连接已关闭", request_id=self._current_file_request))
-            self._current_file_request = None
-            self._file_chunks = []
-            
-        for request_id, future in self._pending_requests.items():
-            if not future.done():
-                future.set_exception(WebSocketResponse(type="error", code=404, message="连接已关闭", request_id=request_id))
-        self._pending_requests.clear()
+        self._fail_pending_requests("连接已关闭")
         
         # 最后关闭websocket连接
         if self.ws:
             await self.ws.close()
             self.ws = None
 
-    async def send_request(self, api: str, params: Optional[Dict[str, Any]] = None, request_id: Optional[str] = None, timeout: float = 300.0) -> WebSocketResponse:
+    async def send_request(self, api: str, params: Optional[Dict[str, Any]] = None, request_id: Optional[str] = None, timeout: float = 300.0,
+                           expected_size: Optional[int] = None, destination: Optional[memoryview] = None) -> WebSocketResponse:
+        """发送请求并等待响应
+
+        :param expected_size: 响应文件数据的大小，给出时预分配接收缓冲区
+        :param destination: 文件数据直接写入该缓冲区，收满时响应的Bytes即为destination本身
+        """
         request_id = request_id or uuid4().hex
-        if not await self.is_connected():
+        if not self.connected:
             raise WebSocketResponse(type="error", code=400, message="WebSocket未连接", request_id=request_id)
             
         request = WebSocketRequest(api=api, params=params or {}, request_id=request_id)
         future = asyncio.get_running_loop().create_future()
         self._pending_requests[request.request_id] = future
+        if expected_size:
+            self._expected_sizes[request.request_id] = int(expected_size)
+        if destination is not None:
+            self._destinations[request.request_id] = destination
         
+        started = time.perf_counter()
         try:
             await self.ws.send(str(request))
             return await asyncio.wait_for(future, timeout=timeout)
         except asyncio.CancelledError:
+            # 清理后继续传播取消，调用方的任务才能真正结束
             self._pending_requests.pop(request.request_id, None)
-            if request.request_id == self._current_file_request:
-                self._current_file_request = None
-                self._file_chunks = []
-            raise WebSocketResponse(type="error", code=404, message="请求已取消", request_id=request.request_id)
+            self._close_transfer(request.request_id)
+            raise
         except asyncio.TimeoutError:
             self._pending_requests.pop(request.request_id, None)
-            if request.request_id == self._current_file_request:
-                self._current_file_request = None
-                self._file_chunks = []
+            self._close_transfer(request.request_id)
             raise WebSocketResponse(type="error", code=401, message=f"请求超时: {api}", request_id=request.request_id)
         except Exception as e:
             self._pending_requests.pop(request.request_id, None)
-            if request.request_id == self._current_file_request:
-                self._current_file_request = None
-                self._file_chunks = []
+            self._close_transfer(request.request_id)
             if isinstance(e, WebSocketResponse):
                 raise
             raise WebSocketResponse(type="error", code=402, message=str(e), request_id=request.request_id)
+        finally:
+            self._expected_sizes.pop(request.request_id, None)
+            self._destinations.pop(request.request_id, None)
+            elapsed = time.perf_counter() - started
+            GATEWAY_LATENCY.labels(api).observe(elapsed)
+            tracer.observe(f"ws.{api}", elapsed)
+
+    async def stream_request(self, api: str, params: Optional[Dict[str, Any]] = None, timeout: float = 300.0,
+                             queue_size: int = 16) -> AsyncIterator[Union[bytes, memoryview]]:
+        """发送请求并按到达顺序产出文件数据块
+
+        最多缓存queue_size个未消费的数据块，消费者处理慢时暂停读取该连接，
+        同一连接上其他请求的响应也会随之延后，应使用不承载其他请求的专用连接(见Gateway.read_stream)。
+        timeout为相邻两个数据块之间的最长等待时间。
+        响应失败时在产出已收到的数据块后抛出WebSocketResponse。
+        """
+        request_id = uuid4().hex
+        if not self.connected:
+            raise WebSocketResponse(type="error", code=400, message="WebSocket未连接", request_id=request_id)
+            
+        request = WebSocketRequest(api=api, params=params or {}, request_id=request_id)
+        future = asyncio.get_running_loop().create_future()
+        stream: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self._pending_requests[request_id] = future
+        self._streams[request_id] = stream
+        
+        started = time.perf_counter()
+        try:
+            await self.ws.send(str(request))
+            received = 0
+            while True:
+                chunk = await asyncio.wait_for(stream.get(), timeout=timeout)
+                if chunk is None:
+                    break
+                received += len(chunk)
+                yield chunk
+            await future
+            if not received:
+                raise WebSocketResponse(type="error", code=403, message="文件传输异常: 没有收到文件数据", request_id=request_id)
+        except asyncio.TimeoutError:
+            raise WebSocketResponse(type="error", code=401, message=f"请求超时: {api}", request_id=request_id)
+        except (WebSocketResponse, GeneratorExit, asyncio.CancelledError):
+            raise
+        except Exception as e:
+            raise WebSocketResponse(type="error", code=402, message=str(e), request_id=request_id)
+        finally:
+            if future.done() and not future.cancelled():
+                future.exception()  # 提前关闭时避免未取回异常的警告
+            self._pending_requests.pop(request_id, None)
+            self._streams.pop(request_id, None)
+            self._close_transfer(request_id)
+            # 提前关闭时清空队列，唤醒可能阻塞在put上的接收循环
+            while not stream.empty():
+                stream.get_nowait()
+            elapsed = time.perf_counter() - started
+            GATEWAY_LATENCY.labels(api).observe(elapsed)
+            tracer.observe(f"ws.{api}", elapsed)
 
     async def __aenter__(self):
         await self.connect()  # 失败时会抛出异常
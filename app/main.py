@@ -1,8 +1,10 @@
 from fastapi import FastAPI
 from app.core.logger import log
 from app.core.config import config
-from app.utils.server import Server
+from app.utils.server import Gateway, Server
+from app.core.http_client import HttpClient
 from app.core.events import event_manager
+from app.core.scanner import stop as scanner_stop
 
 
 server = Server()
@@ -39,5 +41,11 @@ async def shutdown_event(app: FastAPI):
         log.info(f"节点注销成功")
     except Exception as e:
         log.error(f"节点注销失败: {str(e)}")
+    try:
+        await scanner_stop()
+    except Exception as e:
+        log.error(f"扫描器停止失败: {str(e)}")
+    await Gateway.close_shared()
+    await HttpClient.close_shared()
     log.info("Event service stopped")
     return
@@ -0,0 +1,241 @@
+"""
+多进程扫描协调
+
+单个事件循环上，10MB批次的JSON编码和大压缩包的子包记录构造会占满一个CPU核。
+scanner.workers 大于0时，协调进程(FastAPI进程)把NDS按ID排序后轮流分配给N个工作进程，
+每个工作进程有独立的事件循环、网关连接池和HTTP客户端，只扫描分到的NDS。
+
+- 各工作进程共用同一个文件索引、spool和zip_info缓存，其中的记录按NDS区分，
+  NDS集合变化后分到其他工作进程时，已有的索引记录和积压批次随NDS一起转移
+- 工作进程每 scanner.workers_report_interval 秒上报一次状态和指标快照，协调进程汇总后对外提供，
+  /metrics 中工作进程的指标带 worker=<序号> 标签
+- 工作进程退出或超过 scanner.workers_heartbeat_timeout 秒未上报时，协调进程结束并重启它
+"""
+import os
+import time
+import queue
+import asyncio
+from typing import Any, Dict, List, Optional
+from aiomultiprocess import Process
+from aiomultiprocess.core import get_context
+from app.core.logger import log
+from app.core.config import config
+from app.core.metrics import registry, WORKER_RESTARTS
+from app.utils.server import Server
+
+
+def _worker_settings(index: int) -> Dict[str, Any]:
+    """工作进程的运行时配置: 当前进程的全部配置，网关客户端ID按序号区分"""
+    settings = config.get_all()
+    scanner = dict(settings.get("scanner") or {})
+    scanner["workers"] = 0
+    settings["scanner"] = scanner
+    # 各工作进程连接同一网关，客户端ID相同时网关会互相顶替连接
+    gateway = dict(settings.get("gateway") or {})
+    client_id = gateway.get("client_id") or f"Scanner-{config.get('app.id')}"
+    gateway["client_id"] = f"{client_id}-w{index}"
+    settings["gateway"] = gateway
+    return settings
+
+
+async def run_worker(index: int, nds_ids: List[str], settings: Dict[str, Any], status_queue, stop_event, report_interval: float):
+    """工作进程入口，扫描分到的NDS并定期上报状态，stop_event置位后停止"""
+    config.update(settings)
+    # Scanner 和模块级 Server 在导入时读取配置，必须在合并配置之后导入
+    from app.core.http_client import HttpClient
+    from app.services.scanner import Scanner
+
+    scanner = Scanner()
+    try:
+        await scanner.start(nds_ids)
+        log.info(f"扫描工作进程[{index}]已启动: pid={os.getpid()} NDS={nds_ids}")
+        next_report = 0.0
+        while not stop_event.is_set():
+            if time.monotonic() >= next_report:
+                status_queue.put((index, os.getpid(), scanner.status(), registry.snapshot()))
+                next_report = time.monotonic() + report_interval
+            await asyncio.sleep(0.5)
+    finally:
+        await scanner.stop()
+        if scanner.file_index:
+            scanner.file_index.close()
+        if scanner.zip_info_cache:
+            scanner.zip_info_cache.close()
+        await HttpClient.close_shared()
+        log.info(f"扫描工作进程[{index}]已停止")
+
+
+class _WorkerHandle:
+    def __init__(self, index: int, nds_ids: List[str]):
+        self.index = index
+        self.nds_ids = nds_ids
+        self.process: Optional[Process] = None
+        self.started_at = 0.0
+        self.last_report = 0.0
+        self.restarts = 0
+        self.status: Optional[Dict[str, Any]] = None
+        self.metrics: Optional[Dict[str, Any]] = None  # 最近一次上报的指标快照
+
+
+class ScanCoordinator:
+    """扫描工作进程的协调者: 分配分片、监控并重启工作进程、汇总状态"""
+
+    def __init__(self, workers: int):
+        self.workers = max(1, int(workers))
+        self.report_interval = float(config.get("scanner.workers_report_interval", 5))
+        self.heartbeat_timeout = float(config.get("scanner.workers_heartbeat_timeout", 60))
+        self.restart_delay = float(config.get("scanner.workers_restart_delay", 5))
+        self.running = False
+        self._handles: List[_WorkerHandle] = []
+        self._status_queue = None
+        self._stop_event = None
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._collect_task: Optional[asyncio.Task] = None
+        self._gauge_registered = False
+
+    @staticmethod
+    def assign(nds_ids: List[str], workers: int) -> List[List[str]]:
+        """按NDS ID排序后轮流分配，NDS集合不变时每个NDS固定落在同一个工作进程"""
+        ordered = sorted(nds_ids, key=lambda nds_id: (len(nds_id), nds_id))
+        shards = [ordered[i::workers] for i in range(min(workers, len(ordered)))]
+        return [shard for shard in shards if shard]
+
+    def _spawn(self, handle: _WorkerHandle):
+        handle.process = Process(
+            target=run_worker,
+            args=(handle.index, handle.nds_ids, _worker_settings(handle.index), self._status_queue, self._stop_event, self.report_interval),
+            name=f"scanner-worker-{handle.index}",
+            daemon=True,
+        )
+        handle.process.start()
+        handle.started_at = handle.last_report = time.monotonic()
+        handle.status = None
+        handle.metrics = None
+
+    async def start(self, server: Server) -> Dict[str, Any]:
+        if self.running:
+            return self.status()
+        response = await server.info()
+        if not response.get("gateway"):
+            raise ValueError("未配置网关")
+        nds_ids = [str(link.get("id")) for link in response.get("ndsLinks") or [] if link.get("id")]
+        if not nds_ids:
+            raise ValueError("未配置NDS")
+
+        context = get_context()
+        self._status_queue = context.Queue()
+        self._stop_event = context.Event()
+        self._handles = [_WorkerHandle(index, shard) for index, shard in enumerate(self.assign(nds_ids, self.workers))]
+        self.running = True
+        for handle in self._handles:
+            self._spawn(handle)
+            log.info(f"扫描工作进程[{handle.index}]: pid={handle.process.pid} NDS={handle.nds_ids}")
+        self._collect_task = asyncio.create_task(self._collect_loop())
+        self._monitor_task = asyncio.create_task(self._monitor_loop())
+        if not self._gauge_registered:
+            registry.callback_gauge(
+                "scanner_workers_alive", "存活的扫描工作进程数", [],
+                lambda: [((), sum(1 for handle in self._handles if handle.process and handle.process.is_alive()))]
+            )
+            registry.add_source("worker", lambda: [(str(handle.index), handle.metrics) for handle in self._handles if handle.metrics])
+            self._gauge_registered = True
+        return self.status()
+
+    def _drain_status(self, timeout: float):
+        try:
+            index, pid, status, metrics = self._status_queue.get(timeout=timeout)
+        except queue.Empty:
+            return
+        if index < len(self._handles) and self._handles[index].process and self._handles[index].process.pid == pid:
+            handle = self._handles[index]
+            handle.status = status
+            handle.metrics = metrics
+            handle.last_report = time.monotonic()
+
+    async def _collect_loop(self):
+        """接收工作进程上报的状态，阻塞读取放在线程中"""
+        while self.running:
+            try:
+                await asyncio.to_thread(self._drain_status, 1.0)
+            except Exception as e:
+                log.error(f"接收工作进程状态失败: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def _monitor_loop(self):
+        """重启已退出或心跳超时的工作进程"""
+        while self.running:
+            await asyncio.sleep(1)
+            now = time.monotonic()
+            for handle in self._handles:
+                process = handle.process
+                if process is None or not self.running:
+                    continue
+                if process.is_alive():
+                    if now - handle.last_report <= self.heartbeat_timeout:
+                        continue
+                    log.error(f"扫描工作进程[{handle.index}]超过{self.heartbeat_timeout:.0f}s未上报状态，结束进程: pid={process.pid}")
+                    process.terminate()
+                    try:
+                        await process.join(10)
+                    except asyncio.TimeoutError:
+                        process.kill()
+                        await process.join()
+                elif now - handle.started_at < self.restart_delay:
+                    # 启动后立即退出时避免频繁重启
+                    continue
+                else:
+                    log.error(f"扫描工作进程[{handle.index}]已退出: pid={process.pid} exitcode={process.exitcode}")
+                handle.restarts += 1
+                WORKER_RESTARTS.labels(str(handle.index)).inc()
+                self._spawn(handle)
+                log.info(f"扫描工作进程[{handle.index}]已重启: pid={handle.process.pid} 第{handle.restarts}次")
+
+    async def stop(self, timeout: float = 30):
+        """通知工作进程停止，超时未退出的强制结束"""
+        if not self.running:
+            return
+        self.running = False
+        self._stop_event.set()
+        for task in (self._monitor_task, self._collect_task):
+            if task:
+                task.cancel()
+        await asyncio.gather(*[task for task in (self._monitor_task, self._collect_task) if task], return_exceptions=True)
+        self._monitor_task = self._collect_task = None
+        for handle in self._handles:
+            process = handle.process
+            if process is None or process.exitcode is not None:
+                continue
+            try:
+                await process.join(timeout)
+            except asyncio.TimeoutError:
+                log.warning(f"扫描工作进程[{handle.index}]未在{timeout:.0f}s内退出，强制结束: pid={process.pid}")
+                process.kill()
+                await process.join()
+
+    def status(self) -> Dict[str, Any]:
+        """汇总各工作进程状态"""
+        now = time.monotonic()
+        workers = []
+        for handle in self._handles:
+            process = handle.process
+            workers.append({
+                "index": handle.index,
+                "pid": process.pid if process else None,
+                "alive": bool(process and process.is_alive()),
+                "nds": handle.nds_ids,
+                "restarts": handle.restarts,
+                "last_report": round(now - handle.last_report, 1),
+                "status": handle.status,
+            })
+        spools = [worker["status"]["spool"] for worker in workers if worker["status"] and worker["status"]["spool"].get("enabled")]
+        return {
+            "running": self.running,
+            "workers": workers,
+            "spool": {
+                "enabled": bool(spools),
+                "depth": sum(spool["depth"] for spool in spools),
+                "bytes": sum(spool["bytes"] for spool in spools),
+                "oldest_age": max((spool["oldest_age"] for spool in spools), default=0),
+                "rejected": sum(spool["rejected"] for spool in spools),
+            },
+        }
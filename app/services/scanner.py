@@ -1,15 +1,56 @@
-import json
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple, AsyncIterator
 import re
+import time
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
+from contextlib import aclosing
 from app.core.logger import log
+from app.core.config import config
+from app.core.serialization import dumps
+from app.core.tracing import span, tracer
+from app.core.metrics import (
+    registry, SCAN_CYCLE_SECONDS, FILES_LISTED, NEW_FILES, ENTRIES_SUBMITTED,
+    BATCH_BYTES, BATCH_RECORDS, BATCH_REJECTED, ERRORS, ZIP_INFO_CACHE, FILES_OUT_OF_WINDOW
+)
 from app.utils.server import Server, Gateway
+from app.utils.batch import BatchBuilder
+from app.utils.file_index import FileIndex
+from app.utils.spool import BatchSpool
+from app.utils.zip_info_cache import ZipInfoCache
+from app.utils.nds_lister import NdsLister, create_lister
+from app.utils.scheduler import AdaptiveScheduler
+from app.utils.partition import owned as partition_owned
+from app.utils.timestamps import extract_timestamps, filter_window, latest_timestamp, newest_first, time_window
+from app.core.ws_client import WebSocketResponse
 from app.core.errors import NotFoundError
 
 
 server = Server()
 
+# 每个文件都会命中的指标子项，只获取一次
+ZIP_INFO_CACHE_HIT = ZIP_INFO_CACHE.labels("hit")
+ZIP_INFO_CACHE_MISS = ZIP_INFO_CACHE.labels("miss")
+
+
+class NdsMetrics:
+    """单个NDS的指标子项
+
+    扫描循环开始时按(nds_id, data_type)获取一次，循环中直接使用，避免每次重复查找标签。
+    """
+    __slots__ = ("cycle_seconds", "entries_submitted", "files_listed", "new_files", "out_of_window")
+
+    DATA_TYPES = ("MRO", "MDT")
+
+    def __init__(self, nds_id: str):
+        self.cycle_seconds = SCAN_CYCLE_SECONDS.labels(nds_id)
+        self.entries_submitted = ENTRIES_SUBMITTED.labels(nds_id)
+        self.files_listed = {data_type: FILES_LISTED.labels(nds_id, data_type) for data_type in self.DATA_TYPES}
+        self.new_files = {data_type: NEW_FILES.labels(nds_id, data_type) for data_type in self.DATA_TYPES}
+        self.out_of_window = {
+            (data_type, edge): FILES_OUT_OF_WINDOW.labels(nds_id, data_type, edge)
+            for data_type in self.DATA_TYPES for edge in ("old", "future")
+        }
+
 
 class ResponseModel:
     def __init__(self, code: int = 200, data: dict = None, message: str = ""):
@@ -18,7 +59,7 @@ class ResponseModel:
         self.message = message
     
     def __str__(self):
-        return json.dumps(self.dict(), ensure_ascii=False)
+        return dumps(self.dict())
 
 
 class Scanner:
@@ -31,8 +72,41 @@ class Scanner:
     def __init__(self):
         self.gateway: Dict = None
         self._tasks: Dict[str, asyncio.Task] = {}  # 修复类型注解
-        self.max_interval = 300 # 扫描间隔，单位秒
-        self.min_interval = 60 # 最小扫描间隔，单位秒
+        self.max_interval = float(config.get("scanner.max_interval", 300)) # 最大扫描间隔，单位秒
+        self.min_interval = float(config.get("scanner.min_interval", 60)) # 最小扫描间隔，单位秒
+        self.start_jitter = float(config.get("scanner.schedule.start_jitter", 30)) # 首轮扫描前的最大随机延迟，单位秒
+        self.zip_info_concurrency = max(1, int(config.get("scanner.zip_info_concurrency", 16)))  # 单个NDS同时在途的zip_info请求数
+        self.zip_info_engine = config.get("scanner.zip_info_engine", "gateway")  # gateway: 网关解析; local: 读取尾部在本地解析中央目录
+        self.file_index: Optional[FileIndex] = None  # 已处理文件的本地索引，启动时创建
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self.zip_info_cache: Optional[ZipInfoCache] = None  # zip_info结果缓存，启动时创建
+        self.spool: Optional[BatchSpool] = None  # 提交失败批次的落盘队列，启动时创建
+        self._drain_task: Optional[asyncio.Task] = None
+        
+        self._schedulers: Dict[str, AdaptiveScheduler] = {}
+        self._metrics: Dict[str, NdsMetrics] = {}  # nds_id -> 指标子项，扫描循环开始时创建
+        self._listers: Dict[str, NdsLister] = {}  # 配置了直连的NDS，扫描阶段不经过网关
+        self._file_stats: Dict[str, Dict[str, Dict]] = {}  # nds_id -> 本轮直连列表得到的 {路径: {'size', 'mtime'}}
+        
+        # 副本划分: 绑定同一网关的扫描器副本按app.id做rendezvous哈希，各自只扫描归属自己的NDS
+        self.partition = bool(config.get("scanner.partition.enabled", False))
+        self.partition_interval = float(config.get("scanner.partition.interval", 30))  # 重新发现副本、重新划分的间隔，单位秒
+        self._links: Dict[str, Dict] = {}  # ndsLink id -> ndsLink
+        self._nds_ids: Optional[List[str]] = None  # 工作进程模式下分到的NDS
+        self._partition_task: Optional[asyncio.Task] = None
+        
+        # 增量扫描: 只扫描水位线(减去回溯时间)之后的日期分区，定期做一次全量扫描
+        self.incremental = bool(config.get("scanner.incremental.enabled", False))
+        self.lookback_hours = float(config.get("scanner.incremental.lookback_hours", 24))
+        self.full_scan_interval = float(config.get("scanner.incremental.full_scan_interval", 3600))  # 全量扫描间隔，单位秒
+        self.partition_format = config.get("scanner.incremental.partition_format", "%Y-%m-%d")  # 日期分区目录名格式
+        self._watermarks: Dict[Tuple[str, str], str] = {}  # (nds_id, data_type) -> 已扫描到的最新14位时间戳
+        self._last_full_scan: Dict[str, float] = {}
+        
+        # 时间窗口: 按文件名时间戳丢弃过旧和未来时间的文件，不交给后端过滤
+        self.window = bool(config.get("scanner.window.enabled", False))
+        self.window_max_age_hours = float(config.get("scanner.window.max_age_hours", 72))
+        self.window_future_minutes = float(config.get("scanner.window.future_tolerance_minutes", 60))  # 也是增量水位线允许超前当前时间的上限
         
         self.running = False
         
@@ -53,94 +127,474 @@ class Scanner:
         except Exception as e:
             log.warning(f"解析时间字符串失败: {str(e)}")
         return None
+
+    def _nds_metrics(self, nds_id) -> NdsMetrics:
+        """扫描循环创建的指标子项，不在扫描循环中调用时按需创建"""
+        metrics = self._metrics.get(str(nds_id))
+        if metrics is None:
+            metrics = self._metrics[str(nds_id)] = NdsMetrics(str(nds_id))
+        return metrics
+
+    def _need_full_scan(self, nds_id) -> bool:
+        if not self.incremental:
+            return True
+        last = self._last_full_scan.get(str(nds_id))
+        return last is None or time.monotonic() - last >= self.full_scan_interval
+
+    async def _list_files(self, gateway: Gateway, nds_id, path: str, file_filter: str):
+        """列出文件清单，配置了直连的NDS通过SFTP/FTP直接列出，否则经网关scan
+        
+        与 Gateway.scan_nds 一致，失败时返回异常对象。
+        """
+        lister = self._listers.get(str(nds_id))
+        if lister is None:
+            return await gateway.scan_nds(nds_id, path, file_filter)
+        try:
+            files = await lister.list(path, file_filter, self._file_stats.setdefault(str(nds_id), {}))
+            return WebSocketResponse(type="response", data=files)
+        except FileNotFoundError:
+            # 增量扫描的日期分区可能尚未创建
+            return WebSocketResponse(type="error", code=404, message=f"目录不存在: {path}")
+        except Exception as e:
+            ERRORS.labels("direct_list").inc()
+            log.error(f"NDS[{nds_id}] 直连列表失败: {path} {str(e)}")
+            return e
+
+    async def _scan_files(self, gateway: Gateway, nds_config, data_type: str, full_scan: bool):
+        """扫描NDS文件清单
+        
+        全量扫描列出整个数据目录；增量扫描只列出水位线减去回溯时间之后的日期分区。
+        扫描结果用于推进该NDS、数据类型的时间水位线，水位线不会超过当前时间加 future_tolerance_minutes。
+        """
+        nds_id = nds_config.get("id")
+        path = nds_config.get(f"{data_type}_Path")
+        file_filter = nds_config.get(f"{data_type}_Filter")
+        key = (str(nds_id), data_type)
+        watermark = self._watermarks.get(key)
+        
+        if full_scan or watermark is None:
+            response = await self._list_files(gateway, nds_id, path, file_filter)
+        else:
+            # 分区范围最晚到今天，不列出未来日期的分区
+            end = datetime.now()
+            start = min(datetime.strptime(watermark, '%Y%m%d%H%M%S') - timedelta(hours=self.lookback_hours), end)
+            days = [start.date() + timedelta(days=i) for i in range((end.date() - start.date()).days + 1)]
+            partitions = await asyncio.gather(*[
+                self._list_files(gateway, nds_id, f"{path.rstrip('/')}/{day.strftime(self.partition_format)}/", file_filter)
+                for day in days
+            ])
+            # 不存在的分区视为空
+            files = [file for part in partitions if getattr(part, "code", None) == 200 and part.data for file in part.data]
+            response = WebSocketResponse(type="response", data=files)
+        
+        if getattr(response, "code", None) == 200 and response.data:
+            timestamps = extract_timestamps(response.data)
+            oldest, newest = time_window(self.window_max_age_hours, self.window_future_minutes)
+            if self.window:
+                response.data, timestamps, old, future = filter_window(response.data, timestamps, oldest, newest)
+                out_of_window = self._nds_metrics(nds_id).out_of_window
+                out_of_window[data_type, "old"].inc(old)
+                out_of_window[data_type, "future"].inc(future)
+            # 只用合法且不在未来的时间戳推进水位线，避免异常文件名让增量扫描跳过后续文件
+            latest = latest_timestamp(timestamps, newest)
+            if latest and (watermark is None or latest > watermark):
+                self._watermarks[key] = latest
+        return response
+
+    async def _zip_info(self, gateway: Gateway, nds_id, file: Dict):
+        """获取子包信息，优先使用缓存，成功的结果写入缓存
+        
+        zip_info_engine为local且已知文件大小(直连列表)时，读取尾部在本地解析中央目录，失败时退回网关zip_info。
+        """
+        cache = self.zip_info_cache
+        if cache:
+            entries = await cache.get(nds_id, file['path'], file.get('size'), file.get('mtime'))
+            if entries is not None:
+                ZIP_INFO_CACHE_HIT.inc()
+                return WebSocketResponse(type="response", data=entries)
+            ZIP_INFO_CACHE_MISS.inc()
+        if self.zip_info_engine == "local" and file.get('size'):
+            response = await gateway.zip_directory(nds_id, file['path'], file['size'])
+            if getattr(response, "code", None) != 200:
+                ERRORS.labels("zip_directory").inc()
+                log.warning(f"NDS[{nds_id}] 本地解析中央目录失败，改用网关zip_info: {file['path']} {str(response)}")
+                response = await gateway.zip_info(nds=nds_id, path=file['path'])
+        else:
+            response = await gateway.zip_info(nds=nds_id, path=file['path'])
+        if cache and getattr(response, "code", None) == 200 and response.data is not None:
+            await cache.put(nds_id, file['path'], response.data, file.get('size'), file.get('mtime'))
+        return response
+
+    async def _iter_zip_info(self, gateway: Gateway, nds_id, files: List[Dict]) -> AsyncIterator[Tuple[Dict, object]]:
+        """并发获取子包信息
+        
+        保持最多zip_info_concurrency个zip_info请求在途，按完成顺序产出(file, response)。
+        生成器关闭时取消所有未完成的请求。
+        """
+        files_iter = iter(files)
+        task_files: Dict[asyncio.Task, Dict] = {}
+        try:
+            while True:
+                while len(task_files) < self.zip_info_concurrency:
+                    file = next(files_iter, None)
+                    if file is None:
+                        break
+                    task = asyncio.create_task(self._zip_info(gateway, nds_id, file))
+                    task_files[task] = file
+                if not task_files:
+                    return
+                done, _ = await asyncio.wait(task_files.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task_files.pop(task), task.result()
+        finally:
+            for task in task_files:
+                task.cancel()
+            if task_files:
+                await asyncio.gather(*task_files, return_exceptions=True)
     
-    async def scan_loop(self, nds_config):
+    async def _filter_new_files(self, server: Server, nds_id, data_type: str, files_nds) -> List[str]:
+        """过滤出需要扫描子包的新文件
+        
+        先排除本地索引中已处理过的路径，剩余路径再交由后端按任务规则过滤。
+        新文件在批次提交成功后记入索引；后端过滤掉的路径带到期时间落盘，只在一段时间内不再发送，
+        避免任务规则变化后这些文件在索引保留期内都无法重新提交。
+        """
+        if getattr(files_nds, "code", None) != 200 or not files_nds.data:
+            return []
+        paths = files_nds.data
+        metrics = self._nds_metrics(nds_id)
+        metrics.files_listed[data_type].inc(len(paths))
+        if self.file_index:
+            paths = await self.file_index.filter_unseen(nds_id, data_type, paths)
+            if not paths:
+                return []
+        new_files = await server.ndsfile_filter_files(nds_id, data_type, paths) or []
+        metrics.new_files[data_type].inc(len(new_files))
+        if self.file_index:
+            new_set = set(new_files)
+            await self.file_index.reject(nds_id, data_type, [path for path in paths if path not in new_set])
+        return new_files
+
+    async def _mark_submitted(self, nds_id, files: List[Dict]):
+        """提交成功的文件记入索引，不再需要的zip_info缓存随之删除"""
+        if self.zip_info_cache:
+            await self.zip_info_cache.discard(nds_id, [(file['path'], file.get('size'), file.get('mtime')) for file in files])
+        if not self.file_index:
+            return
+        for data_type in {file['type'] for file in files}:
+            await self.file_index.add(nds_id, data_type, [file['path'] for file in files if file['type'] == data_type])
+
+    async def _submit_batch(self, server: Server, nds_id, batch: BatchBuilder) -> Optional[int]:
+        """提交一个批次，返回后端响应码，请求异常时返回None
+        
+        后端返回429或请求异常时批次写入spool，由后台任务重放。
+        """
+        if not batch.records:
+            # 批次内都是空压缩包，无需提交
+            await self._mark_submitted(nds_id, batch.files)
+            return 200
+        body = batch.body()
+        BATCH_BYTES.observe(len(body))
+        BATCH_RECORDS.observe(batch.records)
         try:
-            server = Server()
-            gateway = Gateway(self.gateway, f"Scanner-NDS-{nds_config.get('id')}")
-            while self.running:
+            with span("scan.submit", nds=nds_id, records=batch.records, bytes=len(body)):
+                response = await server.batch_add_tasks(body)
+            code = response.get('code')
+        except Exception as e:
+            log.error(f"批量添加文件失败: {str(e)}")
+            response, code = None, None
+        if code == 200:
+            log.info(f"批量添加文件成功: {response.get('data')}")
+            self._nds_metrics(nds_id).entries_submitted.inc(batch.records)
+            await self._mark_submitted(nds_id, batch.files)
+            return code
+        if code == 429:
+            BATCH_REJECTED.inc()
+        else:
+            ERRORS.labels("submit").inc()
+        if code == 429 or code is None:
+            if self.spool:
+                await self.spool.put(nds_id, body, batch.files, batch.records)
+                log.warning(f"批次已写入spool等待重放: {batch.records}条记录, {len(body)}字节")
+        else:
+            log.error(f"批量添加文件失败: {response.get('message')}")
+        return code
+
+    async def _drain_loop(self):
+        """按后端可接受的速率重放spool中的批次，失败时指数退避"""
+        backoff_min = float(config.get("scanner.spool.backoff_min", 5))
+        backoff_max = float(config.get("scanner.spool.backoff_max", 300))
+        delay = backoff_min
+        while self.running:
+            try:
+                entry = self.spool.oldest(self._spool_nds())
+                if entry is None:
+                    await asyncio.sleep(backoff_min)
+                    continue
                 try:
-                    start_time = datetime.now()
-                    mro_new_files = []
+                    meta, body = await self.spool.load(entry)
+                except Exception as e:
+                    log.error(f"spool批次读取失败: {entry.name} {str(e)}")
+                    self.spool.reject(entry)
+                    continue
+                try:
+                    response = await server.batch_add_tasks(body)
+                    code = response.get('code')
+                except Exception as e:
+                    log.error(f"spool批次重放失败: {str(e)}")
+                    response, code = None, None
+                if code == 200:
+                    self.spool.remove(entry)
+                    self._nds_metrics(meta.get("nds_id")).entries_submitted.inc(meta.get("records", 0))
+                    await self._mark_submitted(meta.get("nds_id"), meta.get("files", []))
+                    log.info(f"spool批次重放成功: {response.get('data')}")
+                    delay = backoff_min
+                    continue
+                if code == 429:
+                    BATCH_REJECTED.inc()
+                else:
+                    ERRORS.labels("spool").inc()
+                if code is not None and code != 429:
+                    self.spool.reject(entry)
+                    log.error(f"spool批次被后端拒绝: {entry.name} {response.get('message')}")
+                    continue
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, backoff_max)
+            except Exception as e:
+                # 文件系统或索引异常时退避后继续，不能让重放任务退出
+                ERRORS.labels("spool").inc()
+                log.error(f"spool重放异常: {str(e)}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, backoff_max)
+
+    def status(self) -> Dict:
+        """扫描器运行状态，工作进程模式下定期上报给协调进程"""
+        return {
+            "running": self.running,
+            "nds": {
+                nds_id: {"alive": not task.done(), "scheduler": repr(self._schedulers.get(nds_id))}
+                for nds_id, task in self._tasks.items()
+            },
+            "spool": self.spool_stats(),
+            "zip_info_cache": self.zip_info_cache.stats() if self.zip_info_cache else None,
+            "stages": tracer.stats(),
+        }
+
+    def _spool_nds(self) -> Optional[set]:
+        """本进程负责重放的spool批次所属NDS，工作进程模式下为分到的ndsLink对应的NDS，否则不区分"""
+        if self._nds_ids is None:
+            return None
+        return {str((self._links.get(link_id, {}).get("nds") or {}).get("id")) for link_id in self._nds_ids}
+
+    def spool_stats(self) -> Dict:
+        """spool积压情况"""
+        if not self.spool:
+            return {"enabled": False}
+        return {"enabled": True, **self.spool.stats(self._spool_nds())}
+
+    async def _maintenance_loop(self):
+        """定期按保留天数清理文件索引，清理过期的zip_info缓存"""
+        retention_days = float(config.get("scanner.index.retention_days", 30))
+        compact_interval = float(config.get("scanner.index.compact_interval", 86400))
+        while self.running:
+            if self.file_index:
+                try:
+                    await self.file_index.compact(retention_days)
+                except Exception as e:
+                    log.error(f"文件索引清理失败: {str(e)}")
+            if self.zip_info_cache:
+                try:
+                    await self.zip_info_cache.compact()
+                except Exception as e:
+                    log.error(f"zip_info缓存清理失败: {str(e)}")
+            await asyncio.sleep(compact_interval)
+    
+    def _create_scheduler(self) -> AdaptiveScheduler:
+        return AdaptiveScheduler(
+            min_interval=self.min_interval,
+            max_interval=self.max_interval,
+            target_files=int(config.get("scanner.schedule.target_files", 500)),
+            jitter=float(config.get("scanner.schedule.jitter", 0.1)),
+            min_sleep=float(config.get("scanner.schedule.min_sleep", 1))
+        )
+
+    async def scan_loop(self, nds_config, link_id: Optional[str] = None):
+        """单个NDS的扫描循环
+
+        :param link_id: 对应的ndsLink，该任务不再登记在 self._tasks 中(重新划分移出或停止)时退出
+        """
+        current = asyncio.current_task()
+        try:
+            # 所有NDS共用同一个网关连接池
+            gateway = Gateway.shared(self.gateway)
+            scheduler = self._schedulers[str(nds_config.get("id"))] = self._create_scheduler()
+            direct = config.get(f"scanner.direct.{nds_config.get('id')}")
+            if direct and str(nds_config.get("id")) not in self._listers:
+                self._listers[str(nds_config.get("id"))] = create_lister(direct)
+                log.info(f"NDS[{nds_config.get('id')}] 使用{direct.get('protocol', 'sftp')}直连列出文件")
+            metrics = self._metrics[str(nds_config.get("id"))] = NdsMetrics(str(nds_config.get("id")))
+            # 错开同时启动的NDS首轮扫描
+            await asyncio.sleep(scheduler.initial_delay(self.start_jitter))
+            while self.running and (link_id is None or self._tasks.get(link_id) is current):
+                new_files = []
+                try:
+                    start_time = time.monotonic()
+                    file_stats = self._file_stats[str(nds_config.get("id"))] = {}
                     await gateway.connect()
-                    mro_files_nds = await gateway.scan_nds(nds_config.get("id"), nds_config.get("MRO_Path"), nds_config.get("MRO_Filter"))
-                    if mro_files_nds.code == 200:
-                        mro_new_files = await server.ndsfile_filter_files(nds_config.get("id"), "MRO", mro_files_nds.data)
-                    mdt_files_nds = await gateway.scan_nds(nds_config.get("id"), nds_config.get("MDT_Path"), nds_config.get("MDT_Filter"))
-                    if mdt_files_nds.code == 200:
-                        mdt_new_files = await server.ndsfile_filter_files(nds_config.get("id"), "MDT", mdt_files_nds.data)
+                    full_scan = self._need_full_scan(nds_config.get("id"))
+                    with span("scan.list", nds=nds_config.get("id"), data_type="MRO", full=full_scan):
+                        mro_files_nds = await self._scan_files(gateway, nds_config, "MRO", full_scan)
+                    with span("scan.filter", nds=nds_config.get("id"), data_type="MRO"):
+                        mro_new_files = await self._filter_new_files(server, nds_config.get("id"), "MRO", mro_files_nds)
+                    with span("scan.list", nds=nds_config.get("id"), data_type="MDT", full=full_scan):
+                        mdt_files_nds = await self._scan_files(gateway, nds_config, "MDT", full_scan)
+                    with span("scan.filter", nds=nds_config.get("id"), data_type="MDT"):
+                        mdt_new_files = await self._filter_new_files(server, nds_config.get("id"), "MDT", mdt_files_nds)
+                    if full_scan:
+                        self._last_full_scan[str(nds_config.get("id"))] = time.monotonic()
                     
                     # 合并新文件并保留类型信息
                     new_files = [
-                        *[{'path': path, 'type': 'MRO'} for path in mro_new_files],
-                        *[{'path': path, 'type': 'MDT'} for path in mdt_new_files]
+                        *[{'path': path, 'type': 'MRO', **file_stats.get(path, {})} for path in mro_new_files],
+                        *[{'path': path, 'type': 'MDT', **file_stats.get(path, {})} for path in mdt_new_files]
                     ]
+                    # 最新的文件优先获取子包信息
+                    new_files = newest_first(new_files, extract_timestamps([file['path'] for file in new_files]))
 
                     # 扫描新文件子包
                     nds_id = int(nds_config.get("id"))  # 提前获取ID
-                    batch_data = []  # 存储待处理的数据
-                    batch_size = 0  # 当前批次的数据大小
-                    MAX_BATCH_SIZE = 10 * 1024 * 1024  # 10MB
+                    batch = BatchBuilder(10 * 1024 * 1024)  # 单批次上限10MB
                     
-                    for file in new_files:
-                        data = await gateway.zip_info(nds=nds_config.get("id"), path=file['path'])
-                        if data.code == 200:
-                            # 批量添加ndsId和data_type
-                            current_data = [{**item, 'ndsId': nds_id, 'data_type': file['type']} for item in data.data]
-                            current_size = len(json.dumps(current_data).encode('utf-8'))
+                    # 滑动窗口并发获取子包信息，按完成顺序进入批次(耗时包含期间的批次提交)
+                    async with span("scan.zip_info", nds=nds_config.get("id"), files=len(new_files)), \
+                            aclosing(self._iter_zip_info(gateway, nds_config.get("id"), new_files)) as zip_infos:
+                        async for file, data in zip_infos:
+                            if data.code != 200:
+                                continue
+                            # 批量添加ndsId和data_type，每个文件只序列化一次
+                            encoded = batch.encode([{**item, 'ndsId': nds_id, 'data_type': file['type']} for item in data.data])
                             
-                            # 如果当前批次加上新数据超过5MB，先处理当前批次
-                            if batch_size + current_size > MAX_BATCH_SIZE and batch_data:
-                                try:
-                                    response = await server.batch_add_tasks(batch_data)
-                                    if response.get('code') == 429:  # redis高负荷，暂停写入
-                                        batch_data = []  # 清空未成功提交的数据
-                                        batch_size = 0
-                                        break
-                                    elif response.get('code') == 200:
-                                        log.info(f"批量添加文件成功: {response.get('data')}")
-                                        # 成功提交后再重置批次数据
-                                        batch_data = []
-                                        batch_size = 0
-                                    else:
-                                        log.error(f"批量添加文件失败: {response.get('message')}")
-                                        batch_data = []  # 提交失败也清空数据
-                                        batch_size = 0
-                                except Exception as e:
-                                    log.error(f"批量添加文件失败: {str(e)}")
-                                    batch_data = []
-                                    batch_size = 0
+                            # 如果当前批次加上新数据超过上限，先处理当前批次
+                            if not batch.fits(encoded) and batch.records:
+                                code = await self._submit_batch(server, nds_config.get("id"), batch)
+                                # 无论成功与否都重置批次数据
+                                batch.clear()
+                                if code == 429:  # redis高负荷，暂停写入
+                                    break
                             
                             # 添加新数据到批次
-                            batch_data.extend(current_data)
-                            batch_size += current_size
+                            batch.add(encoded, len(data.data), file)
                     
                     # 处理最后一批数据（如果有）
-                    if batch_data:
-                        try:
-                            response = await server.batch_add_tasks(batch_data)
-                            if response.get('code') == 200:
-                                log.info(f"批量添加文件成功: {response.get('data')}")
-                            else:
-                                log.error(f"批量添加文件失败: {response.get('message')}")
-                        except Exception as e:
-                            log.error(f"批量添加文件失败: {str(e)}")
+                    if batch.files:
+                        await self._submit_batch(server, nds_config.get("id"), batch)
                             
                 except Exception as e:
+                    ERRORS.labels("scan").inc()
                     log.error(f"扫描失败:{str(e)}")
                 
-                end_time = datetime.now()
-                elapsed_time = (end_time - start_time).total_seconds()
-                interval = max(self.min_interval, self.max_interval - elapsed_time)
+                elapsed_time = time.monotonic() - start_time
+                metrics.cycle_seconds.observe(elapsed_time)
+                tracer.add("scan.cycle", elapsed_time, nds=nds_config.get("id"), new_files=len(new_files))
+                interval = scheduler.next_delay(start_time, elapsed_time, len(new_files))
+                log.debug(f"NDS[{nds_config.get('id')}] 扫描耗时{elapsed_time:.1f}s, 新文件{len(new_files)}个, {interval:.1f}s后开始下一轮 {scheduler}")
                 await asyncio.sleep(interval)
                 
-
-            if gateway.is_connected():
-                await gateway.disconnect()
         except Exception as e:
             log.error(f"扫描器运行失败: {str(e)}")
     
-    async def start(self):
+    async def _peers(self) -> Optional[List[str]]:
+        """从后端发现绑定同一网关的在线扫描器副本，失败时返回None
+        
+        本节点不在清单中(后端重启或被标记离线)时重新注册。
+        """
+        try:
+            scanners = await server.scanners()
+        except Exception as e:
+            ERRORS.labels("partition").inc()
+            log.error(f"获取扫描器清单失败: {str(e)}")
+            return None
+        gateway_id = (self.gateway or {}).get("id")
+        peers = [
+            str(item.get("id")) for item in scanners
+            if item.get("id") and item.get("status", 1) == 1
+            and (gateway_id is None or item.get("gatewayId") is None or str(item.get("gatewayId")) == str(gateway_id))
+        ]
+        if str(config.get("app.id")) not in peers:
+            try:
+                await server.register()
+            except Exception as e:
+                log.warning(f"重新注册失败: {str(e)}")
+        return peers
+
+    async def _owned_links(self) -> set:
+        """本节点应扫描的ndsLink
+        
+        未开启副本划分时为全部(工作进程模式下为分到的)ndsLink；
+        后端为每个扫描器和NDS的组合分别生成ndsLink，各副本的ndsLink ID不同，按NDS ID划分后再映射回本节点的ndsLink。
+        获取副本清单失败时保持当前划分，首次失败时扫描全部，宁可重复也不漏扫。
+        """
+        candidates = {
+            link_id: str((link.get("nds") or {}).get("id", link_id))
+            for link_id, link in self._links.items() if self._nds_ids is None or link_id in self._nds_ids
+        }
+        if not self.partition:
+            return set(candidates)
+        peers = await self._peers()
+        if peers is None:
+            return set(self._tasks) & set(candidates) if self._tasks else set(candidates)
+        owned_nds = partition_owned(set(candidates.values()), peers, str(config.get("app.id")))
+        return {link_id for link_id, nds_id in candidates.items() if nds_id in owned_nds}
+
+    def _reconcile(self, owned: set):
+        """按划分结果启停各ndsLink的扫描任务，未变化的任务不受影响"""
+        removed = [link_id for link_id in self._tasks if link_id not in owned]
+        added = [link_id for link_id in self._links if link_id in owned and link_id not in self._tasks]
+        for link_id in removed:
+            # 未提交的批次由新的归属节点重新扫描
+            self._tasks.pop(link_id).cancel()
+        for link_id in added:
+            self._tasks[link_id] = asyncio.create_task(self.scan_loop(self._links[link_id].get("nds"), link_id))
+        if self.partition and (removed or added):
+            log.info(f"NDS划分变化: 新增{added} 移出{removed} 当前{sorted(self._tasks)}")
+
+    async def _partition_loop(self):
+        """定期刷新ndsLink和副本清单，副本加入或离开时重新划分"""
+        while self.running:
+            await asyncio.sleep(self.partition_interval)
+            try:
+                response = await server.info()
+                if response.get("ndsLinks") is not None:
+                    self._links = {str(nds_link.get("id")): nds_link for nds_link in response.get("ndsLinks") if nds_link.get("id", None)}
+                self._reconcile(await self._owned_links())
+            except Exception as e:
+                ERRORS.labels("partition").inc()
+                log.error(f"NDS重新划分失败: {str(e)}")
+
+    async def stop(self):
+        """停止所有扫描任务和后台任务"""
+        self.running = False
+        tasks = [*self._tasks.values(), self._maintenance_task, self._drain_task, self._partition_task]
+        self._tasks.clear()
+        for task in tasks:
+            if task and not task.done():
+                task.cancel()
+        await asyncio.gather(*[task for task in tasks if task], return_exceptions=True)
+        for lister in self._listers.values():
+            await lister.close()
+        self._listers.clear()
+        # 关闭网关连接和心跳任务，重新启动时建立新的连接池
+        await Gateway.close_shared()
+        self._file_stats.clear()
+        self._maintenance_task = None
+        self._drain_task = None
+        self._partition_task = None
+
+    async def start(self, nds_ids: Optional[List[str]] = None):
+        """启动扫描
+        
+        :param nds_ids: 只扫描这些NDS(工作进程模式下由协调进程分配的分片)，为空时扫描全部
+        """
         if self.running:
             return "扫描器已启动"
         self.running = True
@@ -159,13 +613,35 @@ class Scanner:
             raise ValueError("绑定网关DNS清单为空, 无法启动扫描器")
         
         
-        ndsList =  response.get("ndsLinks")
+        # spool重放任务按分到的NDS过滤批次，需要在创建之前确定
+        self._nds_ids = nds_ids
+        self._links = {str(nds_link.get("id")): nds_link for nds_link in response.get("ndsLinks") if nds_link.get("id", None)}
+        
+        data_dir = config.get("scanner.data_dir", "data")  # 本地存储的默认目录，相对路径基于工作目录
+        if self.file_index is None and config.get("scanner.index.enabled", True):
+            self.file_index = FileIndex(
+                config.get("scanner.index.path", f"{data_dir}/nds_index.db"),
+                rejected_ttl=float(config.get("scanner.index.rejected_ttl", 21600))
+            )
+        if self.zip_info_cache is None and config.get("scanner.zip_info_cache.enabled", True):
+            self.zip_info_cache = ZipInfoCache(
+                max_entries=int(config.get("scanner.zip_info_cache.max_entries", 1_000_000)),
+                ttl=float(config.get("scanner.zip_info_cache.ttl", 86400)),
+                path=config.get("scanner.zip_info_cache.path", f"{data_dir}/zip_info_cache.db") if config.get("scanner.zip_info_cache.persist", False) else None
+            )
+        if self._maintenance_task is None and (self.file_index or self.zip_info_cache):
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+        if self.spool is None and config.get("scanner.spool.enabled", True):
+            self.spool = BatchSpool(config.get("scanner.spool.path", f"{data_dir}/spool"))
+            self._drain_task = asyncio.create_task(self._drain_loop())
+            registry.callback_gauge("scanner_spool_depth", "spool中待重放的批次数", [], lambda: [((), self.spool.stats(self._spool_nds())["depth"])])
+            registry.callback_gauge("scanner_spool_oldest_age_seconds", "spool中最早批次的积压时长", [], lambda: [((), self.spool.stats(self._spool_nds())["oldest_age"])])
+        
         try:
-            for config in ndsList:
-                if not config.get("id", None):
-                    continue
-                self._tasks[str(config.get("id"))] = asyncio.create_task(self.scan_loop(config.get("nds")))
-            if self._tasks == {}:
+            self._reconcile(await self._owned_links())
+            if self.partition:
+                self._partition_task = asyncio.create_task(self._partition_loop())
+            elif self._tasks == {}:
                 return ValueError("无可用NDS")
             return "扫描器启动成功"
         except Exception as e:
@@ -0,0 +1,55 @@
+from typing import Any, Dict, List
+from app.core.serialization import dumpb
+
+
+class BatchBuilder:
+    """batchAddTasks请求体构建器
+
+    每个文件的子包记录只序列化一次，直接追加到JSON数组缓冲区中，
+    批次大小即缓冲区的实际字节数，提交时无需再次序列化。
+    """
+
+    def __init__(self, max_size: int = 10 * 1024 * 1024):
+        self.max_size = max_size
+        self._buffer = bytearray(b"[")
+        self.records = 0  # 当前批次记录数
+        self.files: List[Dict[str, Any]] = []  # 当前批次包含的文件
+
+    @staticmethod
+    def encode(records: List[Dict[str, Any]]) -> bytes:
+        """序列化一组记录为紧凑的UTF-8 JSON数组"""
+        return dumpb(records)
+
+    @property
+    def size(self) -> int:
+        """提交时请求体的字节数"""
+        return len(self._buffer) + 1
+
+    def fits(self, encoded: bytes) -> bool:
+        """加入encoded后是否仍在批次大小限制内"""
+        return self.size + len(encoded) - 1 <= self.max_size
+
+    def add(self, encoded: bytes, count: int, file: Dict[str, Any]):
+        """追加encode()的结果，count为其中的记录数"""
+        if count:
+            if self.records:
+                self._buffer += b","
+            # 去掉数组两端的方括号
+            self._buffer += memoryview(encoded)[1:-1]
+            self.records += count
+        self.files.append(file)
+
+    def body(self) -> bytearray:
+        """返回完整的JSON数组请求体
+
+        缓冲区直接交给调用方而不复制，构建器换用新的缓冲区，
+        records和files保留到clear()，供提交和写入spool时使用。
+        """
+        body, self._buffer = self._buffer, bytearray(b"[")
+        body += b"]"
+        return body
+
+    def clear(self):
+        del self._buffer[1:]
+        self.records = 0
+        self.files = []
@@ -0,0 +1,151 @@
+import time
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+from app.core.logger import log
+
+
+class FileIndex:
+    """已提交NDS文件的本地索引
+
+    以SQLite保存每个NDS、数据类型下已提交的文件路径，
+    扫描时只把未出现过的路径发送给后端，重启后索引依然有效。
+    后端过滤掉的路径带到期时间(expires_at)一同落盘，rejected_ttl内不再发送，
+    任务规则变化后到期即重新交给后端判断；已提交的路径expires_at为空，只受保留天数限制。
+    查询走内存集合(按NDS和数据类型懒加载)，写入同时落盘。数据库操作都在线程中执行，
+    整理数据库时不会阻塞事件循环。
+    """
+
+    def __init__(self, path: str = "data/nds_index.db", rejected_ttl: float = 21600):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.rejected_ttl = rejected_ttl
+        self._lock = threading.Lock()
+        self._seen: Dict[Tuple[str, str], Set[str]] = {}
+        self._rejected: Dict[Tuple[str, str], Dict[str, float]] = {}  # 路径 -> 到期时间
+        # 工作进程模式下多个进程共用同一数据库，写锁被占用时等待
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS nds_files ("
+            "nds_id TEXT NOT NULL, "
+            "data_type TEXT NOT NULL, "
+            "path TEXT NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "expires_at REAL, "
+            "PRIMARY KEY (nds_id, data_type, path)"
+            ") WITHOUT ROWID"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(nds_files)")}
+        if "expires_at" not in columns:
+            # 旧版本的索引只有已提交的路径
+            self._conn.execute("ALTER TABLE nds_files ADD COLUMN expires_at REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_nds_files_created_at ON nds_files (created_at)")
+        self._conn.commit()
+
+    def _select(self, key: Tuple[str, str]) -> List[Tuple[str, float]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT path, expires_at FROM nds_files WHERE nds_id = ? AND data_type = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (*key, time.time())
+            ).fetchall()
+
+    async def _load(self, key: Tuple[str, str]) -> Tuple[Set[str], Dict[str, float]]:
+        seen = self._seen.get(key)
+        if seen is None:
+            rows = await asyncio.to_thread(self._select, key)
+            seen = {path for path, expires_at in rows if expires_at is None}
+            self._rejected[key] = {path: expires_at for path, expires_at in rows if expires_at is not None}
+            self._seen[key] = seen
+        return seen, self._rejected[key]
+
+    async def filter_unseen(self, nds_id, data_type: str, paths: Iterable[str]) -> List[str]:
+        """返回索引中不存在且不在被拒有效期内的路径，保持原有顺序"""
+        seen, rejected = await self._load((str(nds_id), data_type))
+        if not rejected:
+            return [path for path in paths if path not in seen]
+        now = time.time()
+        return [path for path in paths if path not in seen and rejected.get(path, 0) <= now]
+
+    def _write(self, key: Tuple[str, str], paths: List[str], expires_at):
+        now = time.time()
+        with self._lock:
+            # 已提交的记录不会被改回有到期时间的被拒记录
+            self._conn.executemany(
+                "INSERT INTO nds_files (nds_id, data_type, path, created_at, expires_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (nds_id, data_type, path) DO UPDATE SET created_at = excluded.created_at, expires_at = excluded.expires_at "
+                "WHERE nds_files.expires_at IS NOT NULL",
+                ((key[0], key[1], path, now, expires_at) for path in paths)
+            )
+            self._conn.commit()
+
+    async def add(self, nds_id, data_type: str, paths: Iterable[str]):
+        """记录已提交的路径"""
+        key = (str(nds_id), data_type)
+        seen, rejected = await self._load(key)
+        new_paths = [path for path in paths if path not in seen]
+        if not new_paths:
+            return
+        seen.update(new_paths)
+        for path in new_paths:
+            rejected.pop(path, None)
+        await asyncio.to_thread(self._write, key, new_paths, None)
+
+    async def reject(self, nds_id, data_type: str, paths: Iterable[str]):
+        """记录后端过滤掉的路径，rejected_ttl内不再发送给后端"""
+        if self.rejected_ttl <= 0:
+            return
+        key = (str(nds_id), data_type)
+        seen, rejected = await self._load(key)
+        paths = [path for path in paths if path not in seen]
+        if not paths:
+            return
+        expires_at = time.time() + self.rejected_ttl
+        rejected.update(dict.fromkeys(paths, expires_at))
+        await asyncio.to_thread(self._write, key, paths, expires_at)
+
+    def _compact(self, retention_days: float) -> int:
+        now = time.time()
+        cutoff = now - retention_days * 86400
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM nds_files WHERE created_at < ? OR expires_at < ?", (cutoff, now)
+            ).rowcount
+            self._conn.commit()
+            if removed:
+                self._conn.execute("VACUUM")
+        return removed
+
+    async def compact(self, retention_days: float) -> int:
+        """删除超过保留天数的记录和已到期的被拒记录并整理数据库文件，返回删除的记录数"""
+        removed = await asyncio.to_thread(self._compact, retention_days)
+        if removed:
+            # 内存集合在下次查询时重新加载
+            self._seen.clear()
+            self._rejected.clear()
+            log.info(f"文件索引清理完成: 删除{removed}条过期记录")
+        return removed
+
+    def _count(self) -> Tuple[int, int]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*), COUNT(expires_at) FROM nds_files"
+            ).fetchone()
+
+    async def stats(self) -> Dict[str, int]:
+        """索引统计信息"""
+        total, rejected = await asyncio.to_thread(self._count)
+        return {
+            "records": total - rejected,
+            "rejected": rejected,
+            "size": self.path.stat().st_size if self.path.exists() else 0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        self._seen.clear()
+        self._rejected.clear()
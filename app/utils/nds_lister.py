@@ -0,0 +1,220 @@
+"""
+NDS直连列表
+
+扫描阶段绕过网关，直接通过SFTP/FTP列出NDS上的文件清单，减轻网关CPU压力。
+按NDS配置 scanner.direct.<nds_id>:
+    protocol: sftp | ftp
+    host / port / username / password
+    sessions: 会话池大小，默认4
+    concurrency: 同时进行的目录读取数，默认16(FTP受会话数限制)
+    known_hosts: SFTP主机密钥文件，为空时使用asyncssh默认的 ~/.ssh/known_hosts
+    verify_host_key: 是否校验SFTP主机密钥，默认true，只有显式配置false时才跳过校验
+
+asyncssh / aioftp 只在使用对应协议时导入。
+"""
+import re
+import abc
+import stat
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.logger import log
+
+
+class NdsLister(abc.ABC):
+    """目录递归遍历，子类实现单个目录的读取"""
+
+    def __init__(self, host: str, port: int, username: Optional[str] = None, password: Optional[str] = None,
+                 sessions: int = 4, concurrency: int = 16):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sessions = max(1, int(sessions))
+        self.concurrency = max(1, int(concurrency))
+
+    @abc.abstractmethod
+    async def _listdir(self, path: str) -> List[Tuple[str, bool, Optional[int], Any]]:
+        """返回目录下的 [(名称, 是否目录, 大小, 修改时间)]，目录不存在时抛出FileNotFoundError"""
+
+    async def list(self, path: str, pattern: Optional[str] = None,
+                   stats: Optional[Dict[str, Dict[str, Any]]] = None) -> List[str]:
+        """递归列出path下匹配pattern的文件路径，各级子目录并发读取
+        
+        :param stats: 传入时按路径记录文件的 {'size', 'mtime'}，供本地解析中央目录和zip_info缓存使用
+        """
+        regex = re.compile(pattern) if pattern else None
+        result: List[str] = []
+
+        async def walk(directory: str):
+            subdirs = []
+            for name, is_dir, size, mtime in await self._listdir(directory):
+                full = f"{directory.rstrip('/')}/{name}"
+                if is_dir:
+                    subdirs.append(full)
+                elif regex is None or regex.search(full):
+                    result.append(full)
+                    if stats is not None:
+                        stats[full] = {'size': size, 'mtime': mtime}
+            if subdirs:
+                await asyncio.gather(*[walk(subdir) for subdir in subdirs])
+
+        await walk(path)
+        return result
+
+    async def close(self):
+        pass
+
+
+class SftpLister(NdsLister):
+    """SFTP列表，会话池内的每个SFTP通道都可以并发发送多个请求"""
+
+    def __init__(self, *args, known_hosts: Optional[str] = None, verify_host_key: bool = True, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.known_hosts = known_hosts
+        self.verify_host_key = verify_host_key
+        self._pool: List[Optional[Tuple[Any, Any]]] = [None] * self.sessions  # (连接, SFTP客户端)
+        self._locks = [asyncio.Lock() for _ in range(self.sessions)]
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._next = 0
+
+    async def _session(self, index: int):
+        session = self._pool[index]
+        if session is not None:
+            return session[1]
+        async with self._locks[index]:
+            if self._pool[index] is None:
+                import asyncssh
+                options = {}
+                if not self.verify_host_key:
+                    options["known_hosts"] = None  # asyncssh中known_hosts为None表示不校验
+                elif self.known_hosts:
+                    options["known_hosts"] = self.known_hosts
+                conn = await asyncssh.connect(
+                    self.host, port=self.port, username=self.username, password=self.password, **options
+                )
+                self._pool[index] = (conn, await conn.start_sftp_client())
+            return self._pool[index][1]
+
+    def _reset(self, index: int):
+        session, self._pool[index] = self._pool[index], None
+        if session is not None:
+            session[1].exit()
+            session[0].close()
+
+    async def _listdir(self, path: str) -> List[Tuple[str, bool, Optional[int], Any]]:
+        import asyncssh
+        async with self._semaphore:
+            index = self._next
+            self._next = (self._next + 1) % self.sessions
+            for attempt in range(2):
+                try:
+                    sftp = await self._session(index)
+                    names = await sftp.readdir(path)
+                    break
+                except asyncssh.SFTPNoSuchFile:
+                    raise FileNotFoundError(path)
+                except (asyncssh.HostKeyNotVerifiable, asyncssh.PermissionDenied):
+                    # 主机密钥或认证失败，重试无意义
+                    raise
+                except (asyncssh.DisconnectError, asyncssh.ConnectionLost, ConnectionError) as e:
+                    # 会话断开时重建后重试一次
+                    self._reset(index)
+                    if attempt:
+                        raise
+                    log.warning(f"SFTP会话断开，重新连接: {self.host}:{self.port} {str(e)}")
+        result = []
+        for name in names:
+            if name.filename in (".", ".."):
+                continue
+            attrs = name.attrs
+            if attrs.type == asyncssh.FILEXFER_TYPE_DIRECTORY:
+                is_dir = True
+            elif attrs.type == asyncssh.FILEXFER_TYPE_UNKNOWN and attrs.permissions is not None:
+                is_dir = stat.S_ISDIR(attrs.permissions)
+            else:
+                is_dir = False
+            result.append((name.filename, is_dir, attrs.size, attrs.mtime))
+        return result
+
+    async def close(self):
+        for index in range(self.sessions):
+            session = self._pool[index]
+            self._reset(index)
+            if session is not None:
+                await session[0].wait_closed()
+
+
+class FtpLister(NdsLister):
+    """FTP列表，每个控制连接同一时间只能执行一个命令，并发度等于会话数"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._idle: asyncio.Queue = asyncio.Queue()
+        for _ in range(self.sessions):
+            self._idle.put_nowait(None)  # None表示尚未建立的会话
+
+    async def _connect(self):
+        import aioftp
+        client = aioftp.Client()
+        await client.connect(self.host, self.port)
+        await client.login(self.username or "anonymous", self.password or "")
+        return client
+
+    async def _listdir(self, path: str) -> List[Tuple[str, bool, Optional[int], Any]]:
+        import aioftp
+        client = await self._idle.get()
+        try:
+            for attempt in range(2):
+                try:
+                    if client is None:
+                        client = await self._connect()
+                    entries = await client.list(path)
+                    break
+                except aioftp.StatusCodeError as e:
+                    if "550" in {str(code) for code in e.received_codes}:
+                        raise FileNotFoundError(path)
+                    raise
+                except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+                    # 控制连接断开时重建后重试一次
+                    if client is not None:
+                        client.close()
+                    client = None
+                    if attempt:
+                        raise
+                    log.warning(f"FTP会话断开，重新连接: {self.host}:{self.port} {str(e)}")
+        finally:
+            self._idle.put_nowait(client)
+        return [
+            (entry.name, info.get("type") == "dir", int(info["size"]) if info.get("size") else None, info.get("modify"))
+            for entry, info in entries
+        ]
+
+    async def close(self):
+        while not self._idle.empty():
+            client = self._idle.get_nowait()
+            if client is not None:
+                client.close()
+
+
+def create_lister(options: Dict[str, Any]) -> NdsLister:
+    """按配置创建直连列表实例"""
+    protocol = str(options.get("protocol", "sftp")).lower()
+    kwargs = dict(
+        host=options.get("host"),
+        username=options.get("username"),
+        password=options.get("password"),
+        sessions=options.get("sessions", 4),
+        concurrency=options.get("concurrency", 16),
+    )
+    if not kwargs["host"]:
+        raise ValueError("直连列表未配置host")
+    if protocol == "sftp":
+        return SftpLister(
+            port=int(options.get("port", 22)),
+            known_hosts=options.get("known_hosts"),
+            verify_host_key=options.get("verify_host_key", True) is not False,
+            **kwargs
+        )
+    if protocol == "ftp":
+        return FtpLister(port=int(options.get("port", 21)), **kwargs)
+    raise ValueError(f"不支持的直连协议: {protocol}")
@@ -0,0 +1,43 @@
+"""
+扫描器副本间的NDS划分
+
+多个扫描器副本绑定同一网关时，按最高随机权重(rendezvous)哈希把NDS分给各副本:
+每个NDS交给 hash(副本ID, NDS ID) 最大的副本。副本加入或离开时，
+只有归属于变化副本的NDS需要迁移，其余NDS保持原归属。
+"""
+import hashlib
+from typing import Dict, Iterable, List, Optional, Set
+
+
+def _weight(node: str, key: str) -> int:
+    digest = hashlib.blake2b(f"{node}\x00{key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def owner(key: str, nodes: Iterable[str]) -> Optional[str]:
+    """返回key归属的节点，节点为空时返回None"""
+    best = None
+    best_weight = -1
+    for node in nodes:
+        weight = _weight(node, key)
+        # 权重相同时按节点ID决定，保证各副本计算结果一致
+        if weight > best_weight or (weight == best_weight and node > best):
+            best, best_weight = node, weight
+    return best
+
+
+def assign(keys: Iterable[str], nodes: Iterable[str]) -> Dict[str, List[str]]:
+    """返回 {节点: [归属的key]}"""
+    nodes = sorted(set(nodes))
+    result: Dict[str, List[str]] = {node: [] for node in nodes}
+    for key in keys:
+        node = owner(key, nodes)
+        if node is not None:
+            result[node].append(key)
+    return result
+
+
+def owned(keys: Iterable[str], nodes: Iterable[str], node: str) -> Set[str]:
+    """返回归属于node的key，node总是参与划分"""
+    nodes = set(nodes) | {node}
+    return {key for key in keys if owner(key, nodes) == node}
@@ -0,0 +1,66 @@
+import random
+from typing import Optional
+
+
+class AdaptiveScheduler:
+    """单个NDS的自适应扫描调度
+
+    根据观测到的新文件速率(指数加权平均)计算扫描周期，使每个周期大约处理target_files个新文件，
+    周期限制在[min_interval, max_interval]之间：空闲的NDS逐渐放慢到max_interval，繁忙的NDS加快到min_interval。
+    周期耗时超过扫描周期且仍有新文件时视为积压，只等待min_sleep就开始下一轮。
+    所有等待时间都叠加随机抖动，避免同时启动的NDS同时请求网关。
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 60,
+        max_interval: float = 300,
+        target_files: int = 500,
+        jitter: float = 0.1,
+        smoothing: float = 0.3,
+        min_sleep: float = 1
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_files = target_files
+        self.jitter = jitter  # 抖动比例，0.1表示±10%
+        self.smoothing = smoothing  # 新样本在速率平均中的权重
+        self.min_sleep = min_sleep
+        self.rate: Optional[float] = None  # 新文件速率(个/秒)
+        self.interval = min_interval  # 当前扫描周期(秒)
+        self._last_start: Optional[float] = None
+
+    def _jittered(self, seconds: float) -> float:
+        if not self.jitter:
+            return seconds
+        return seconds * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def initial_delay(self, max_delay: float) -> float:
+        """首轮扫描前的随机延迟"""
+        return random.uniform(0, max_delay) if max_delay > 0 else 0
+
+    def next_delay(self, started: float, elapsed: float, new_files: int) -> float:
+        """记录一轮扫描结果并返回距下一轮开始的等待时间
+
+        :param started: 本轮开始时间(time.monotonic())
+        :param elapsed: 本轮耗时(秒)
+        :param new_files: 本轮发现的新文件数
+        """
+        window = started - self._last_start if self._last_start is not None else max(elapsed, self.interval)
+        self._last_start = started
+        sample = new_files / window if window > 0 else 0.0
+        self.rate = sample if self.rate is None else self.smoothing * sample + (1 - self.smoothing) * self.rate
+
+        if self.rate > 0:
+            self.interval = min(self.max_interval, max(self.min_interval, self.target_files / self.rate))
+        else:
+            self.interval = self.max_interval
+
+        if new_files and elapsed >= self.interval:
+            # 积压: 尽快开始下一轮
+            return self._jittered(self.min_sleep)
+        return self._jittered(max(self.min_sleep, self.interval - elapsed))
+
+    def __repr__(self) -> str:
+        rate = f"{self.rate:.3f}" if self.rate is not None else "-"
+        return f"AdaptiveScheduler(interval={self.interval:.1f}s, rate={rate}/s)"
@@ -1,16 +1,65 @@
-import json
+import mmap
+import asyncio
+import inspect
+import tempfile
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, Optional, Union
 from app.core.config import config
+from app.core.logger import log
 from app.core.http_client import HttpClient, HttpConfig
+from app.core.compression import BodyCompressor
+from app.core.serialization import dumpb, dumps
 from app.core.ws_client import WebSocketClient, WebSocketResponse
+from app.utils.zip_directory import read_zip_directory
 from uuid import uuid4
 
+
+class _BufferContent:
+    """以单个分块发送bytearray请求体，可重复迭代"""
+
+    def __init__(self, body: bytearray):
+        self.body = body
+
+    async def __aiter__(self):
+        yield self.body
+
+
 class Server:
     def __init__(self):
         self.server = HttpClient(
             f"{config.get('server.protocol')}://{config.get('server.host')}:{config.get('server.port')}/api/",
-            config=HttpConfig(timeout=config.get("server.timeout", 3600))
+            config=HttpConfig(
+                timeout=config.get("server.timeout", 3600),
+                connect_timeout=config.get("server.connect_timeout", 10),
+                write_timeout=config.get("server.write_timeout", 60),
+                pool_timeout=config.get("server.pool_timeout", 60),
+                http2=config.get("server.http2", False),
+                max_connections=config.get("server.max_connections", 100),
+                max_keepalive_connections=config.get("server.max_keepalive_connections", 20),
+                keepalive_expiry=config.get("server.keepalive_expiry", 30)
+            )
         )
         self.id = config.get("app.id")
+        # ndsfiles/filter 和 ndsfiles/batchAddTasks 的请求体压缩
+        self.compressor = BodyCompressor(
+            algorithm=config.get("server.compression.algorithm") if config.get("server.compression.enabled", False) else None,
+            level=config.get("server.compression.level"),
+            min_size=config.get("server.compression.min_size", 64 * 1024)
+        )
+
+    async def _post_json(self, endpoint: str, body: bytes | bytearray):
+        """发送已序列化的JSON请求体，按配置压缩"""
+        body, headers = await self.compressor.compress(body)
+        headers["Content-Type"] = "application/json"
+        if not isinstance(body, bytes):
+            # httpx只把bytes当作完整请求体，bytearray作为单个分块发送以免复制，长度由请求头给出
+            headers["Content-Length"] = str(len(body))
+            body = _BufferContent(body)
+        return await self.server.post(endpoint, content=body, headers=headers)
+
+    @staticmethod
+    def _encode(data) -> bytes:
+        return dumpb(data)
 
     async def register(self):
         response = await self.server.post("scanner/register", json={
@@ -21,22 +70,30 @@ class Server:
         if response.get("code") == 200:
             return response.get("data")
         else:
-            raise Exception(f"注册失败: {json.dumps(response, ensure_ascii=False)}")
+            raise Exception(f"注册失败: {dumps(response)}")
         
     async def unregister(self):
         response = await self.server.put(f"scanner/{config.get('app.id')}", json={ "status": 0 })
         if response.get("code") == 200:
             return response.get("data")
         else:
-            raise Exception(f"注销失败: {json.dumps(response, ensure_ascii=False)}")
+            raise Exception(f"注销失败: {dumps(response)}")
         
 
+    async def scanners(self):
+        """获取已注册的扫描器清单"""
+        response = await self.server.get("scanner/list")
+        if response.get("code") == 200:
+            return response.get("data") or []
+        else:
+            raise Exception(f"获取扫描器清单失败: {dumps(response)}")
+
     async def info(self):
         response = await self.server.get(f"scanner/{config.get('app.id')}")
         if response.get("code") == 200:
             return response.get("data")
         else:
-            raise Exception(f"获取信息失败: {json.dumps(response, ensure_ascii=False)}")
+            raise Exception(f"获取信息失败: {dumps(response)}")
     
     async def gateway_nds(self, gateway_id: str=None):
         if not gateway_id:
@@ -45,7 +102,7 @@ class Server:
         if response.get("code") == 200:
             return response.get("data").get("ndsLinks")
         else:
-            raise Exception(f"获取网关DNS清单失败: {json.dumps(response, ensure_ascii=False)}")
+            raise Exception(f"获取网关DNS清单失败: {dumps(response)}")
         
     async def ndsfile_filter_files(self, ndsId: str, date_type: str, file_paths: str):
         '''
@@ -57,46 +114,128 @@ class Server:
             raise Exception("Date type 不能为空")
         if not file_paths:
             raise Exception("file_paths 不能为空")
-        response = await self.server.post("ndsfiles/filter", json={
+        response = await self._post_json("ndsfiles/filter", self._encode({
             "ndsId": ndsId,
             "data_type": date_type,
             "file_paths": file_paths
-        })
+        }))
         if response.get("code") == 200:
             return response.get("data")
         else:
-            raise Exception(f"获取文件失败: {json.dumps(response, ensure_ascii=False)}")
+            raise Exception(f"获取文件失败: {dumps(response)}")
 
-    async def batch_add_tasks(self, tasks: list):
+    async def batch_add_tasks(self, tasks: list | bytes | bytearray):
         '''
         批量添加ZIP INFO信息
+        tasks 可以是任务列表，也可以是已序列化好的JSON数组请求体
         '''
         if not tasks:
             raise Exception("tasks 不能为空")
         
-        response = await self.server.post("ndsfiles/batchAddTasks", json=tasks)
+        if not isinstance(tasks, (bytes, bytearray)):
+            tasks = self._encode(tasks)
+        response = await self._post_json("ndsfiles/batchAddTasks", tasks)
         return response
 
 
 class Gateway:
-    def __init__(self, gateway, client_id: str|None=None):
+    """网关客户端
+    
+    持有一组到同一网关的WebSocket连接，每个请求分发到待响应请求最少的已连接连接上。
+    通过 Gateway.shared() 获取进程内按网关地址共享的实例，所有NDS扫描任务共用同一个连接池。
+    """
+    _shared: Dict[str, "Gateway"] = {}
+
+    def __init__(self, gateway, client_id: str|None=None, pool_size: int = 1):
         self.client_id = client_id or uuid4().hex
         self.gateway_ws_url = f"ws://{gateway.get('host')}:{gateway.get('port')}/v1/nds/ws/"
-        self.ws_client = WebSocketClient(self.gateway_ws_url, self.client_id)
+        pool_size = max(1, int(pool_size))
+        self.ws_clients = [
+            WebSocketClient(
+                self.gateway_ws_url,
+                self.client_id if pool_size == 1 else f"{self.client_id}-{i}",
+                heartbeat_interval=config.get("gateway.heartbeat_interval", 30),
+                spill_threshold=config.get("gateway.read.spill_threshold", 64 * 1024 * 1024),
+                spill_dir=config.get("gateway.read.spill_dir")
+            )
+            for i in range(pool_size)
+        ]
+        self.ws_client = self.ws_clients[0]
+        self._connect_lock: Optional[asyncio.Lock] = None
+        # 流式读取的背压会暂停整条连接的接收，使用不在连接池中的专用连接，首次流式读取时创建
+        self._stream_client: Optional[WebSocketClient] = None
+
+    @classmethod
+    def shared(cls, gateway) -> "Gateway":
+        """获取进程内共享的网关连接池，连接数由 gateway.pool_size 配置，客户端ID由 gateway.client_id 配置"""
+        gateway_ws_url = f"ws://{gateway.get('host')}:{gateway.get('port')}/v1/nds/ws/"
+        instance = cls._shared.get(gateway_ws_url)
+        if instance is None:
+            instance = cls(
+                gateway,
+                config.get("gateway.client_id") or f"Scanner-{config.get('app.id')}",
+                pool_size=config.get("gateway.pool_size", 2)
+            )
+            cls._shared[gateway_ws_url] = instance
+        return instance
+
+    @classmethod
+    async def close_shared(cls):
+        """断开所有共享的网关连接池，之后的shared()重新创建"""
+        instances = list(cls._shared.values())
+        cls._shared.clear()
+        await asyncio.gather(*[instance.disconnect() for instance in instances], return_exceptions=True)
+
+    def _client(self) -> WebSocketClient:
+        """选择待响应请求最少的已连接连接"""
+        connected = [client for client in self.ws_clients if client.connected]
+        if not connected:
+            return self.ws_client
+        return min(connected, key=lambda client: client.pending)
 
     async def connect(self):
-        await self.ws_client.connect()
+        """连接池中所有未连接的连接，至少有一个连接可用时视为成功"""
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            results = await asyncio.gather(
+                *[client.connect() for client in self.ws_clients if not client.connected],
+                return_exceptions=True
+            )
+            if not any(client.connected for client in self.ws_clients):
+                errors = [result for result in results if isinstance(result, Exception)]
+                raise errors[0] if errors else WebSocketResponse(type="error", code=400, message="WebSocket未连接")
         
     async def disconnect(self):
-        await self.ws_client.close()
+        clients = [*self.ws_clients, self._stream_client] if self._stream_client else self.ws_clients
+        await asyncio.gather(*[client.close() for client in clients])
+
+    async def _stream_connection(self) -> WebSocketClient:
+        """流式读取专用连接，断开时重新连接"""
+        if self._stream_client is None:
+            self._stream_client = WebSocketClient(
+                self.gateway_ws_url,
+                f"{self.client_id}-stream",
+                heartbeat_interval=config.get("gateway.heartbeat_interval", 30)
+            )
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            await self._stream_client.connect()
+        return self._stream_client
     
     async def is_connected(self):
-        return await self.ws_client.is_connected()
+        return any(client.connected for client in self.ws_clients)
+
+    @property
+    def pending(self) -> int:
+        """连接池中待响应的请求总数"""
+        return sum(client.pending for client in self.ws_clients)
     
     async def scan_nds(self, nds: str, path: str, filter: str):
 
         try:
-            response = await self.ws_client.send_request(
+            response = await self._client().send_request(
                 api="scan", 
                 params={
                     "nds_id": nds, 
@@ -110,7 +249,7 @@ class Gateway:
 
     async def zip_info(self, nds: str, path: str):
         try:
-            response = await self.ws_client.send_request(
+            response = await self._client().send_request(
                 api="zip_info", 
                 params={
                     "nds_id": nds, 
@@ -121,19 +260,168 @@ class Gateway:
         except Exception as e:
             return e
 
+    async def zip_directory(self, nds: str, path: str, archive_size: int, tail_size: Optional[int] = None):
+        """通过read读取压缩包尾部的中央目录，在本地解析子包清单
+        
+        返回格式与zip_info一致，解析不占用网关CPU。需要已知压缩包大小，失败时返回异常对象。
+        """
+        async def read(offset: int, size: int) -> bytes:
+            response = await self.read_ranged(nds, path, offset, size)
+            if getattr(response, "code", None) != 200:
+                raise response
+            try:
+                if len(response.Bytes) != size:
+                    raise WebSocketResponse(type="error", code=403, message=f"读取长度不符: {offset}+{size}, 实际{len(response.Bytes)}")
+                return bytes(response.Bytes)
+            finally:
+                response.close()
+        
+        try:
+            entries = await read_zip_directory(
+                read, archive_size, int(tail_size or config.get("gateway.zip_directory.tail_size", 64 * 1024))
+            )
+            # 与网关zip_info一致，每个子包记录所属压缩包路径
+            for entry in entries:
+                entry["sub_file_name"] = path
+            return WebSocketResponse(type="response", data=entries)
+        except Exception as e:
+            return e
+
     async def read(self, nds: str, path: str, header_offset: int, size: int):
         try:
-            response = await self.ws_client.send_request(
+            response = await self._client().send_request(
                 api="read", 
                 params={
                     "nds_id": nds, 
                     "path": path,
                     "header_offset": header_offset,
                     "size": size
-                }
+                },
+                expected_size=size
             )
             return response
         except Exception as e:
             return e
     
-    
\ No newline at end of file
+    
+
+    async def read_stream(self, nds: str, path: str, header_offset: int, size: int) -> AsyncIterator[Union[bytes, memoryview]]:
+        """流式读取文件片段，按到达顺序产出数据块
+
+        与read不同，失败时直接抛出WebSocketResponse。在专用连接上进行，消费者处理慢时
+        只暂停该连接，不影响连接池上扫描的scan/zip_info响应；多个流式读取之间会相互等待。
+        """
+        client = await self._stream_connection()
+        async with aclosing(client.stream_request(
+            api="read",
+            params={
+                "nds_id": nds,
+                "path": path,
+                "header_offset": header_offset,
+                "size": size
+            },
+            queue_size=config.get("gateway.read.stream_queue_size", 16)
+        )) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    async def read_into(self, nds: str, path: str, header_offset: int, size: int, file) -> int:
+        """流式读取文件片段并写入file，返回写入的字节数
+
+        file的write可以是普通方法或协程(如aiofiles)，写入耗时会通过背压减慢接收。
+        """
+        written = 0
+        async with aclosing(self.read_stream(nds, path, header_offset, size)) as chunks:
+            async for chunk in chunks:
+                result = file.write(chunk)
+                if inspect.isawaitable(result):
+                    await result
+                written += len(chunk)
+        return written
+
+    @staticmethod
+    def _release_parts(parts: list, view: memoryview):
+        """释放分段目标区间和整个缓冲区的视图"""
+        for part in parts:
+            try:
+                part.release()
+            except BufferError as e:
+                # 仍有对象引用该区间时交给垃圾回收
+                log.warning(f"分段缓冲区释放失败: {e}")
+        view.release()
+
+    @staticmethod
+    def _close_spill(buffer: mmap.mmap):
+        """关闭落盘缓冲区的可写映射，仍被引用时留给垃圾回收"""
+        try:
+            buffer.close()
+        except BufferError as e:
+            log.warning(f"落盘缓冲区关闭失败: {e}")
+
+    async def read_ranged(self, nds: str, path: str, header_offset: int, size: int,
+                          part_size: Optional[int] = None, parallelism: Optional[int] = None):
+        """分段并发读取文件片段
+
+        把size拆成part_size大小的子区间，最多parallelism个同时在途，分散到连接池的各个连接上，
+        各分段的数据直接写入整个文件缓冲区的对应区间。不超过part_size时等同于read。
+        超过 gateway.read.spill_threshold 时缓冲区为临时文件的映射，完成后以只读mmap返回。
+        """
+        part_size = max(1, int(part_size or config.get("gateway.read.part_size", 8 * 1024 * 1024)))
+        if size <= part_size:
+            return await self.read(nds, path, header_offset, size)
+        parallelism = max(1, int(parallelism or config.get("gateway.read.parallelism", 4)))
+        
+        spill_threshold = config.get("gateway.read.spill_threshold", 64 * 1024 * 1024)
+        file = None
+        if spill_threshold is not None and size > spill_threshold:
+            file = tempfile.TemporaryFile(dir=config.get("gateway.read.spill_dir"))
+            file.truncate(size)
+            buffer = mmap.mmap(file.fileno(), size)
+        else:
+            buffer = bytearray(size)
+        view = memoryview(buffer)
+        # 各分段的目标区间，结束后先逐个释放，映射才能关闭
+        parts = [view[offset:offset + part_size] for offset in range(0, size, part_size)]
+        semaphore = asyncio.Semaphore(parallelism)
+        
+        async def fetch(offset: int, destination: memoryview):
+            async with semaphore:
+                response = await self._client().send_request(
+                    api="read",
+                    params={
+                        "nds_id": nds,
+                        "path": path,
+                        "header_offset": header_offset + offset,
+                        "size": len(destination)
+                    },
+                    destination=destination
+                )
+            try:
+                # 收满时数据已在destination中，长度不符时Bytes为单独的副本
+                if response.Bytes is not destination:
+                    raise WebSocketResponse(type="error", code=403, message=f"分段读取长度不符: {offset}+{len(destination)}, 实际{len(response.Bytes or b'')}")
+            finally:
+                response.close()
+        
+        tasks = [asyncio.create_task(fetch(offset, part)) for offset, part in zip(range(0, size, part_size), parts)]
+        try:
+            await asyncio.gather(*tasks)
+        except (Exception, asyncio.CancelledError) as e:
+            # 等所有分段结束后再释放缓冲区，取消时继续向上传播
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._release_parts(parts, view)
+            if file is not None:
+                self._close_spill(buffer)
+                file.close()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return e
+        self._release_parts(parts, view)
+        if file is not None:
+            self._close_spill(buffer)
+            # 与单个read落盘时一致，返回只读映射，关闭文件后映射依然有效
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            file.close()
+        return WebSocketResponse(type="response", Bytes=buffer)
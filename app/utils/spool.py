@@ -0,0 +1,106 @@
+import os
+import time
+import asyncio
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+from app.core.serialization import dumpb, loads
+
+
+class BatchSpool:
+    """提交失败批次的本地落盘队列
+
+    后端返回429或请求异常时，批次请求体连同所属NDS和文件清单写入spool目录，
+    由后台任务按先进先出顺序重放。每个批次一个文件，
+    首行为元数据JSON，其后为原样的请求体。
+    文件名带所属NDS ID，多个工作进程共用同一目录时各自只重放分到的NDS的批次。
+    """
+
+    SUFFIX = ".batch"
+    REJECTED_SUFFIX = ".rejected"
+
+    def __init__(self, directory: str = "data/spool"):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._seq = 0
+        # 写入中途崩溃留下的临时文件不是完整批次；多个进程共用目录时其他进程可能正在写入，只清理较早的
+        cutoff = time.time() - 600
+        for tmp in self.directory.glob("*.tmp"):
+            try:
+                if tmp.stat().st_mtime < cutoff:
+                    tmp.unlink(missing_ok=True)
+            except FileNotFoundError:
+                continue
+
+    def _write(self, path: Path, meta: Dict[str, Any], body: bytes):
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            f.write(dumpb(meta))
+            f.write(b"\n")
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    async def put(self, nds_id, body: bytes, files: List[Dict[str, Any]], records: int = 0) -> Path:
+        """写入一个批次，records为批次内的记录数"""
+        self._seq += 1
+        path = self.directory / f"{time.time_ns():020d}-{self._seq:06d}-{nds_id}{self.SUFFIX}"
+        meta = {"nds_id": nds_id, "files": files, "records": records, "created_at": time.time()}
+        await asyncio.to_thread(self._write, path, meta, body)
+        return path
+
+    @staticmethod
+    def _owned(path: Path, nds_ids: Optional[Set[str]]) -> bool:
+        if nds_ids is None:
+            return True
+        parts = path.stem.split("-", 2)
+        # 文件名不带NDS ID的旧批次只由不区分NDS的单进程扫描器重放
+        return len(parts) == 3 and parts[2] in nds_ids
+
+    def entries(self, nds_ids: Optional[Set[str]] = None) -> List[Path]:
+        """按写入顺序返回待重放的批次，nds_ids不为空时只返回这些NDS的批次"""
+        return sorted(path for path in self.directory.glob(f"*{self.SUFFIX}") if self._owned(path, nds_ids))
+
+    def oldest(self, nds_ids: Optional[Set[str]] = None) -> Optional[Path]:
+        entries = self.entries(nds_ids)
+        return entries[0] if entries else None
+
+    @staticmethod
+    def _read(path: Path) -> Tuple[Dict[str, Any], bytes]:
+        with open(path, "rb") as f:
+            data = f.read()
+        header, _, body = data.partition(b"\n")
+        return loads(header), body
+
+    async def load(self, path: Path) -> Tuple[Dict[str, Any], bytes]:
+        """读取批次的元数据和请求体"""
+        return await asyncio.to_thread(self._read, path)
+
+    def remove(self, path: Path):
+        path.unlink(missing_ok=True)
+
+    def reject(self, path: Path):
+        """后端明确拒绝的批次移出队列，保留文件以便排查"""
+        path.rename(path.with_suffix(self.REJECTED_SUFFIX))
+
+    def stats(self, nds_ids: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """队列深度、字节数和最早批次的积压时长(秒)，nds_ids不为空时只统计这些NDS的批次"""
+        depth = 0
+        size = 0
+        oldest = None
+        for path in self.directory.glob(f"*{self.SUFFIX}"):
+            if not self._owned(path, nds_ids):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            depth += 1
+            size += stat.st_size
+            oldest = stat.st_mtime if oldest is None else min(oldest, stat.st_mtime)
+        return {
+            "depth": depth,
+            "bytes": size,
+            "oldest_age": round(time.time() - oldest, 3) if oldest is not None else 0,
+            "rejected": sum(1 for path in self.directory.glob(f"*{self.REJECTED_SUFFIX}") if self._owned(path, nds_ids)),
+        }
@@ -0,0 +1,80 @@
+"""
+文件名时间戳批量处理
+
+NDS文件名中带14位时间戳(如 FDD-LTE_MRO_ZTE_OMC1_20250208000000.zip)。
+定长数字串的字典序即时间先后，比较和排序都直接使用字符串，不构造datetime。
+"""
+import re
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+_TIME_PATTERN = re.compile(r'[_-](\d{14})')
+# 整个清单按行拼接后一次匹配，每行产出该行第一个时间戳，没有时为空串。
+# 占有量词跳过分隔符之间的片段，不做回溯
+_LINE_PATTERN = re.compile(r'^(?:[^_\n-]*+[_-](?!\d{14}))*+[^_\n-]*+(?:[_-](\d{14}))?[^\n]*+$', re.M)
+
+TIME_FORMAT = "%Y%m%d%H%M%S"
+
+
+def extract_timestamps(paths: List[str]) -> List[str]:
+    """返回与paths一一对应的14位时间戳，文件名中没有时间戳的为空串"""
+    if not paths:
+        return []
+    result = _LINE_PATTERN.findall("\n".join(paths))
+    if len(result) != len(paths):
+        # 路径中含换行符时逐个匹配
+        result = []
+        for path in paths:
+            match = _TIME_PATTERN.search(path)
+            result.append(match.group(1) if match else "")
+    return result
+
+
+def time_window(max_age_hours: float, future_minutes: float, now: Optional[datetime] = None) -> Tuple[str, str]:
+    """返回时间窗口的上下界(14位时间戳)"""
+    now = now or datetime.now()
+    oldest = (now - timedelta(hours=max_age_hours)).strftime(TIME_FORMAT)
+    newest = (now + timedelta(minutes=future_minutes)).strftime(TIME_FORMAT)
+    return oldest, newest
+
+
+def filter_window(paths: List[str], timestamps: List[str], oldest: str, newest: str) -> Tuple[List[str], List[str], int, int]:
+    """过滤出时间窗口内的文件，没有时间戳的文件保留
+
+    :return: (保留的路径, 对应的时间戳, 过旧的文件数, 未来时间的文件数)
+    """
+    kept_paths = []
+    kept_timestamps = []
+    old = future = 0
+    for path, ts in zip(paths, timestamps):
+        if ts and ts < oldest:
+            old += 1
+        elif ts and ts > newest:
+            future += 1
+        else:
+            kept_paths.append(path)
+            kept_timestamps.append(ts)
+    return kept_paths, kept_timestamps, old, future
+
+
+def latest_timestamp(timestamps: List[str], newest: str) -> str:
+    """返回不晚于newest且能解析为时间的最大时间戳，没有时为空串
+
+    文件名中的14位数字不一定是时间(如序列号)，只校验最大的几个候选。
+    """
+    candidates = {ts for ts in timestamps if ts and ts <= newest}
+    while candidates:
+        ts = max(candidates)
+        try:
+            datetime.strptime(ts, TIME_FORMAT)
+            return ts
+        except ValueError:
+            candidates.discard(ts)
+    return ""
+
+
+def newest_first(items: List, timestamps: List[str]) -> List:
+    """按时间戳从新到旧排序，时间相同时保持原顺序，没有时间戳的排在最后"""
+    order = sorted(range(len(items)), key=timestamps.__getitem__, reverse=True)
+    # reverse=True 对相等元素同样保持稳定顺序
+    return [items[i] for i in order]
@@ -0,0 +1,127 @@
+"""
+ZIP中央目录解析
+
+只读取压缩包尾部的EOCD记录和中央目录，在扫描器本地解析出子包清单，
+字段与 zipfile.ZipInfo 一致(file_name / header_offset / compress_size / file_size)，
+支持ZIP64。read(offset, size) 由调用方提供，通常为 Gateway.read_ranged。
+"""
+import struct
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+ReadFunc = Callable[[int, int], Awaitable[bytes]]
+
+_EOCD = struct.Struct("<4s4H2LH")  # 签名、磁盘号、中央目录起始磁盘、本磁盘条目数、总条目数、目录大小、目录偏移、注释长度
+_EOCD_SIGNATURE = b"PK\x05\x06"
+_ZIP64_LOCATOR = struct.Struct("<4sLQL")
+_ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+_ZIP64_EOCD = struct.Struct("<4sQ2H2L4Q")
+_ZIP64_EOCD_SIGNATURE = b"PK\x06\x06"
+_CENTRAL_DIR = struct.Struct("<4s4B4HL2L5H2L")
+_CENTRAL_DIR_SIGNATURE = b"PK\x01\x02"
+_ZIP64_EXTRA_ID = 0x0001
+_MAX_COMMENT = 0xFFFF
+_UTF8_FLAG = 0x800
+
+
+class ZipDirectoryError(ValueError):
+    """压缩包尾部或中央目录格式错误"""
+
+
+def _zip64_extra(extra: bytes, file_size: int, compress_size: int, header_offset: int):
+    """按ZIP64扩展字段补全被截断为0xFFFFFFFF的大小和偏移"""
+    pos = 0
+    while pos + 4 <= len(extra):
+        tag, length = struct.unpack_from("<2H", extra, pos)
+        if tag == _ZIP64_EXTRA_ID:
+            data = extra[pos + 4:pos + 4 + length]
+            values = list(struct.unpack_from(f"<{len(data) // 8}Q", data))
+            if file_size == 0xFFFFFFFF:
+                file_size = values.pop(0)
+            if compress_size == 0xFFFFFFFF:
+                compress_size = values.pop(0)
+            if header_offset == 0xFFFFFFFF:
+                header_offset = values.pop(0)
+            break
+        pos += 4 + length
+    return file_size, compress_size, header_offset
+
+
+def parse_central_directory(data: bytes, count: Optional[int] = None) -> List[Dict[str, Any]]:
+    """解析中央目录字节，返回子包清单"""
+    entries = []
+    view = memoryview(data)
+    pos = 0
+    while pos + _CENTRAL_DIR.size <= len(data) and (count is None or len(entries) < count):
+        fields = _CENTRAL_DIR.unpack_from(data, pos)
+        if fields[0] != _CENTRAL_DIR_SIGNATURE:
+            raise ZipDirectoryError(f"中央目录签名错误: 偏移{pos}")
+        flags = fields[5]
+        compress_size, file_size = fields[10], fields[11]
+        name_length, extra_length, comment_length = fields[12], fields[13], fields[14]
+        header_offset = fields[18]
+        pos += _CENTRAL_DIR.size
+        name = bytes(view[pos:pos + name_length])
+        extra = bytes(view[pos + name_length:pos + name_length + extra_length])
+        pos += name_length + extra_length + comment_length
+        if 0xFFFFFFFF in (file_size, compress_size, header_offset):
+            file_size, compress_size, header_offset = _zip64_extra(extra, file_size, compress_size, header_offset)
+        entries.append({
+            # 与zipfile一致: 未设置UTF-8标志时按cp437解码
+            "file_name": name.decode("utf-8" if flags & _UTF8_FLAG else "cp437"),
+            "header_offset": header_offset,
+            "compress_size": compress_size,
+            "file_size": file_size,
+        })
+    if count is not None and len(entries) != count:
+        raise ZipDirectoryError(f"中央目录条目数不符: {len(entries)} != {count}")
+    return entries
+
+
+async def read_zip_directory(read: ReadFunc, archive_size: int, tail_size: int = 64 * 1024) -> List[Dict[str, Any]]:
+    """读取并解析压缩包的中央目录
+
+    :param read: read(offset, size) 读取压缩包片段
+    :param archive_size: 压缩包大小
+    :param tail_size: 首次读取的尾部长度，中央目录较小时一次读取即可完成
+    """
+    if archive_size < _EOCD.size:
+        raise ZipDirectoryError(f"文件过小: {archive_size}")
+    tail_size = min(archive_size, max(tail_size, _EOCD.size))
+    tail_offset = archive_size - tail_size
+    tail = await read(tail_offset, tail_size)
+
+    # EOCD在文件末尾，其后最多跟随65535字节的注释
+    pos = tail.rfind(_EOCD_SIGNATURE, max(0, len(tail) - _EOCD.size - _MAX_COMMENT))
+    if pos < 0:
+        if tail_offset > 0 and tail_size < _EOCD.size + _MAX_COMMENT:
+            return await read_zip_directory(read, archive_size, _EOCD.size + _MAX_COMMENT)
+        raise ZipDirectoryError("未找到EOCD记录")
+    _, _, _, _, count, cd_size, cd_offset, _ = _EOCD.unpack_from(tail, pos)
+    eocd_offset = tail_offset + pos
+
+    if count == 0xFFFF or cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF:
+        locator_pos = pos - _ZIP64_LOCATOR.size
+        if locator_pos < 0:
+            locator = await read(eocd_offset - _ZIP64_LOCATOR.size, _ZIP64_LOCATOR.size)
+            locator_pos = 0
+        else:
+            locator = tail
+        signature, _, zip64_offset, _ = _ZIP64_LOCATOR.unpack_from(locator, locator_pos)
+        if signature != _ZIP64_LOCATOR_SIGNATURE:
+            raise ZipDirectoryError("未找到ZIP64 EOCD定位记录")
+        if zip64_offset >= tail_offset:
+            record = tail[zip64_offset - tail_offset:zip64_offset - tail_offset + _ZIP64_EOCD.size]
+        else:
+            record = await read(zip64_offset, _ZIP64_EOCD.size)
+        fields = _ZIP64_EOCD.unpack_from(record)
+        if fields[0] != _ZIP64_EOCD_SIGNATURE:
+            raise ZipDirectoryError("ZIP64 EOCD签名错误")
+        count, cd_size, cd_offset = fields[7], fields[8], fields[9]
+
+    if cd_offset + cd_size > archive_size:
+        raise ZipDirectoryError(f"中央目录超出文件范围: {cd_offset}+{cd_size} > {archive_size}")
+    if cd_offset >= tail_offset:
+        directory = memoryview(tail)[cd_offset - tail_offset:cd_offset - tail_offset + cd_size]
+    else:
+        directory = await read(cd_offset, cd_size)
+    return parse_central_directory(directory, count)
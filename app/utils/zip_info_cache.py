@@ -0,0 +1,175 @@
+import time
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.core.logger import log
+from app.core.serialization import dumpb, loads
+
+CacheKey = Tuple[str, str, Optional[int], Optional[str]]
+
+
+class ZipInfoCache:
+    """zip_info结果缓存
+
+    NDS上的压缩包写入后不再变化，按(nds_id, 路径, 大小, 修改时间)缓存子包清单，
+    批次提交失败或扫描周期中断后的重试不再向网关重复读取中央目录。
+    批次被后端接受后由调用方discard，缓存中只保留仍可能重试的结果。
+    列表接口未提供大小和修改时间时这两项为空，由ttl限制缓存的有效期。
+    内存中按子包总数做LRU淘汰，子包清单以JSON字节保存以降低内存占用；
+    指定path时同时落盘到SQLite，重启后仍可命中。
+    """
+
+    def __init__(self, max_entries: int = 1_000_000, ttl: float = 86400, path: Optional[str] = None):
+        """
+        :param max_entries: 内存中缓存的子包记录总数上限
+        :param ttl: 缓存有效期(秒)
+        :param path: SQLite文件路径，为空时只缓存在内存中
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._items: "OrderedDict[CacheKey, Tuple[float, int, bytes]]" = OrderedDict()  # key -> (写入时间, 子包数, 子包清单)
+        self._entries = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self.path = Path(path)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # 工作进程模式下多个进程共用同一数据库，写锁被占用时等待
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS zip_info ("
+                "nds_id TEXT NOT NULL, "
+                "path TEXT NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "mtime TEXT NOT NULL, "
+                "count INTEGER NOT NULL, "
+                "entries BLOB NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "PRIMARY KEY (nds_id, path, size, mtime)"
+                ") WITHOUT ROWID"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_zip_info_created_at ON zip_info (created_at)")
+            self._conn.commit()
+
+    @staticmethod
+    def key(nds_id, path: str, size: Optional[int] = None, mtime: Any = None) -> CacheKey:
+        return (str(nds_id), path, size, None if mtime is None else str(mtime))
+
+    def _store(self, key: CacheKey, created_at: float, count: int, data: bytes):
+        old = self._items.pop(key, None)
+        if old is not None:
+            self._entries -= old[1]
+        self._items[key] = (created_at, count, data)
+        self._entries += count
+        while self._entries > self.max_entries and len(self._items) > 1:
+            _, (_, evicted, _) = self._items.popitem(last=False)
+            self._entries -= evicted
+
+    def _select(self, key: CacheKey) -> Optional[Tuple[float, int, bytes]]:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT created_at, count, entries FROM zip_info WHERE nds_id = ? AND path = ? AND size = ? AND mtime = ?",
+                (key[0], key[1], -1 if key[2] is None else key[2], key[3] or "")
+            ).fetchone()
+
+    def _insert(self, key: CacheKey, created_at: float, count: int, data: bytes):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO zip_info (nds_id, path, size, mtime, count, entries, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key[0], key[1], -1 if key[2] is None else key[2], key[3] or "", count, data, created_at)
+            )
+            self._conn.commit()
+
+    async def get(self, nds_id, path: str, size: Optional[int] = None, mtime: Any = None) -> Optional[List[Dict[str, Any]]]:
+        """返回缓存的子包清单，未命中或已过期时返回None"""
+        key = self.key(nds_id, path, size, mtime)
+        item = self._items.get(key)
+        if item is None and self._conn is not None:
+            row = await asyncio.to_thread(self._select, key)
+            if row is not None:
+                item = tuple(row)
+                self._store(key, *item)
+        if item is None or time.time() - item[0] > self.ttl:
+            if item is not None:
+                self._entries -= self._items.pop(key)[1]
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return loads(item[2])
+
+    async def put(self, nds_id, path: str, entries: List[Dict[str, Any]], size: Optional[int] = None, mtime: Any = None):
+        """缓存一个压缩包的子包清单"""
+        key = self.key(nds_id, path, size, mtime)
+        created_at = time.time()
+        data = dumpb(entries)
+        self._store(key, created_at, len(entries), data)
+        if self._conn is not None:
+            await asyncio.to_thread(self._insert, key, created_at, len(entries), data)
+
+    def _delete(self, keys: List[CacheKey]):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM zip_info WHERE nds_id = ? AND path = ? AND size = ? AND mtime = ?",
+                ((key[0], key[1], -1 if key[2] is None else key[2], key[3] or "") for key in keys)
+            )
+            self._conn.commit()
+
+    async def discard(self, nds_id, files: Iterable[Tuple[str, Optional[int], Any]]):
+        """删除已不再需要的缓存，files为 [(路径, 大小, 修改时间)]"""
+        keys = [self.key(nds_id, path, size, mtime) for path, size, mtime in files]
+        for key in keys:
+            item = self._items.pop(key, None)
+            if item is not None:
+                self._entries -= item[1]
+        if self._conn is not None and keys:
+            await asyncio.to_thread(self._delete, keys)
+
+    def _compact(self, cutoff: float) -> int:
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM zip_info WHERE created_at < ?", (cutoff,)).rowcount
+            self._conn.commit()
+            if removed:
+                self._conn.execute("VACUUM")
+        return removed
+
+    async def compact(self) -> int:
+        """删除过期的缓存，返回删除的落盘记录数"""
+        cutoff = time.time() - self.ttl
+        for key in [key for key, item in self._items.items() if item[0] < cutoff]:
+            self._entries -= self._items.pop(key)[1]
+        if self._conn is None:
+            return 0
+        removed = await asyncio.to_thread(self._compact, cutoff)
+        if removed:
+            log.info(f"zip_info缓存清理完成: 删除{removed}条过期记录")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        result = {
+            "files": len(self._items),
+            "entries": self._entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+        if self._conn is not None:
+            with self._lock:
+                result["persisted"] = self._conn.execute("SELECT COUNT(*) FROM zip_info").fetchone()[0]
+        return result
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
+        self._items.clear()
+        self._entries = 0
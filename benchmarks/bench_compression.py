@@ -0,0 +1,94 @@
+"""
+请求体压缩基准测试
+
+对本地替身后端分别以不压缩、gzip、zstd 发送 ndsfiles/filter 文件清单和
+ndsfiles/batchAddTasks 批次，统计线上字节数和端到端耗时。
+--bandwidth 可模拟受限的上行带宽(MB/s)。
+
+用法: python -m benchmarks.bench_compression [--files 100000] [--bandwidth 10]
+"""
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import config
+from app.utils.server import Server
+from app.utils.batch import BatchBuilder
+from app.core.http_client import HttpClient
+from app.core.compression import BodyCompressor, ZSTD_AVAILABLE
+from benchmarks.fake_backend import FakeBackend
+
+
+def build_payloads(files: int, entries: int):
+    paths = [f"/MR/MRO/2025-02-{1 + i % 28:02d}/FDD-LTE_MRO_ZTE_OMC{i % 500}_202502{1 + i % 28:02d}{i % 24:02d}0000.zip" for i in range(files)]
+    batch = BatchBuilder()
+    for i in range(entries // 100):
+        records = [{
+            "file_name": f"FDD-LTE_MRO_ZTE_OMC1_{460000 + j}_20250208000000.xml",
+            "header_offset": 1542313 + j * 534019,
+            "compress_size": 534019,
+            "file_size": 4096000 + j,
+            "sub_file_name": paths[i % files],
+            "ndsId": 1,
+            "data_type": "MRO"
+        } for j in range(100)]
+        encoded = batch.encode(records)
+        if not batch.fits(encoded):
+            break
+        batch.add(encoded, len(records), {"path": paths[i % files], "type": "MRO"})
+    return paths, batch.body()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--entries", type=int, default=40000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--bandwidth", type=float, default=None, help="模拟上行带宽 MB/s")
+    parser.add_argument("--port", type=int, default=18080)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    for key, value in (("server.protocol", "http"), ("server.host", "127.0.0.1"), ("server.port", args.port)):
+        config.set(key, value, save=False)
+
+    paths, batch_body = build_payloads(args.files, args.entries)
+    backend = FakeBackend(bandwidth=args.bandwidth * 1024 * 1024 if args.bandwidth else None)
+    await backend.start(port=args.port)
+
+    modes = [("none", None, None), ("gzip", "gzip", 6)]
+    if ZSTD_AVAILABLE:
+        modes.append(("zstd", "zstd", 3))
+    print(f"filter payload: {args.files} paths, batch payload: {len(batch_body) / 1024 / 1024:.2f} MB")
+    print(f"{'mode':<6} {'endpoint':<14} {'wire MB':>10} {'raw MB':>10} {'ratio':>7} {'ms/req':>9}")
+    try:
+        for name, algorithm, level in modes:
+            server = Server()
+            server.compressor = BodyCompressor(algorithm, level, min_size=0)
+            for endpoint in ("filter", "batchAddTasks"):
+                backend.wire_bytes.clear()
+                backend.raw_bytes.clear()
+                backend.known.clear()
+                t0 = time.perf_counter()
+                for _ in range(args.rounds):
+                    if endpoint == "filter":
+                        await server.ndsfile_filter_files(1, "MRO", paths)
+                        backend.known.clear()
+                    else:
+                        await server.batch_add_tasks(batch_body)
+                elapsed = (time.perf_counter() - t0) / args.rounds
+                wire = backend.wire_bytes[endpoint] / args.rounds
+                raw = backend.raw_bytes[endpoint] / args.rounds
+                print(f"{name:<6} {endpoint:<14} {wire / 1024 / 1024:>10.2f} {raw / 1024 / 1024:>10.2f} {raw / wire:>7.1f} {elapsed * 1000:>9.1f}")
+    finally:
+        await HttpClient.close_shared()
+        await backend.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
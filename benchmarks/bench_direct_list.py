@@ -0,0 +1,88 @@
+"""
+直连列表基准测试
+
+对同一棵磁盘文件树分别通过替身网关(Gateway.scan_nds)和替身SFTP服务器(SftpLister)列出
+MRO/MDT文件清单，校验两者结果一致并比较耗时。--latency 为每次目录读取的附加延迟，
+直连的并发目录读取主要在延迟较高时体现优势。
+
+用法: python -m benchmarks.bench_direct_list [--root /tmp/nds] [--days 7] [--omcs 100] [--latency 0.005]
+"""
+import sys
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.server import Gateway
+from app.utils.nds_lister import create_lister
+from benchmarks.fake_gateway import FakeGateway
+from benchmarks.fake_sftp import FakeSftpServer
+from benchmarks.nds_tree import DiskTree, TreeSpec, generate
+
+FILTERS = {"MRO": ("/MR/MRO/", r"MRO_.*\.zip$"), "MDT": ("/MR/MDT/", r"MDT_.*\.zip$")}
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", help="已生成的磁盘文件树，为空时生成临时文件树")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--omcs", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.005, help="每次目录读取/网关请求的附加延迟(秒)")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--gateway-port", type=int, default=10103)
+    parser.add_argument("--sftp-port", type=int, default=10022)
+    args = parser.parse_args()
+
+    root = args.root
+    if root is None:
+        root = tempfile.mkdtemp(prefix="bench_nds_")
+        generate(TreeSpec(days=args.days, omcs=args.omcs, entries=1, entry_size=64), root)
+    tree = DiskTree(root)
+
+    gateway_server = FakeGateway(tree, latency=args.latency)
+    sftp_server = FakeSftpServer(root, latency=args.latency)
+    await gateway_server.start(port=args.gateway_port)
+    await sftp_server.start(port=args.sftp_port)
+    gateway = Gateway({"host": "127.0.0.1", "port": args.gateway_port}, "bench", pool_size=2)
+    await gateway.connect()
+    lister = create_lister({
+        "protocol": "sftp", "host": "127.0.0.1", "port": args.sftp_port,
+        "username": "nds", "password": "nds",
+        "known_hosts": sftp_server.write_known_hosts(str(Path(tempfile.mkdtemp(prefix="bench_known_hosts_")) / "known_hosts"), port=args.sftp_port),
+        "sessions": args.sessions, "concurrency": args.concurrency,
+    })
+
+    print(f"root={root} latency={args.latency}s sessions={args.sessions} concurrency={args.concurrency}")
+    print(f"{'type':<5} {'files':>8} {'gateway s':>10} {'direct s':>10} {'readdirs':>9}")
+    try:
+        for data_type, (path, pattern) in FILTERS.items():
+            gateway_time = direct_time = 0.0
+            for _ in range(args.rounds):
+                t0 = time.perf_counter()
+                response = await gateway.scan_nds(1, path, pattern)
+                gateway_time += time.perf_counter() - t0
+                readdirs = sftp_server.readdirs
+                t0 = time.perf_counter()
+                files = await lister.list(path, pattern)
+                direct_time += time.perf_counter() - t0
+                readdirs = sftp_server.readdirs - readdirs
+            if sorted(files) != sorted(response.data):
+                raise RuntimeError(f"{data_type} 直连结果与网关不一致: {len(files)} != {len(response.data)}")
+            print(f"{data_type:<5} {len(files):>8} {gateway_time / args.rounds:>10.3f} {direct_time / args.rounds:>10.3f} {readdirs:>9}")
+    finally:
+        await lister.close()
+        await gateway.disconnect()
+        await gateway_server.stop()
+        await sftp_server.stop()
+        if args.root is None:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+"""
+本地文件索引基准测试
+
+模拟按天分区的MRO目录: 每个周期网关返回全部保留天数内的文件清单，
+其中只有少量为新增文件。对比直接把完整清单发给 ndsfiles/filter
+与先经过 FileIndex 过滤后的请求体大小和耗时。
+
+用法: python -m benchmarks.bench_file_index [--days 7] [--omcs 500] [--cycles 12]
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime, timedelta
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.file_index import FileIndex
+
+
+def build_listing(days: int, omcs: int, slots: int, start: datetime):
+    """生成 days 天 × omcs 个OMC × 每天 slots 个时段的文件路径"""
+    paths = []
+    for d in range(days):
+        day = start + timedelta(days=d)
+        for slot in range(slots):
+            ts = (day + timedelta(minutes=15 * slot)).strftime("%Y%m%d%H%M%S")
+            for omc in range(omcs):
+                paths.append(f"/MR/MRO/{day:%Y-%m-%d}/FDD-LTE_MRO_ZTE_OMC{omc}_{ts}.zip")
+    return paths
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--omcs", type=int, default=500)
+    parser.add_argument("--slots", type=int, default=4, help="每天每个OMC的文件数")
+    parser.add_argument("--cycles", type=int, default=12)
+    parser.add_argument("--new", type=int, default=500, help="每个周期新增文件数")
+    args = parser.parse_args()
+
+    start = datetime(2025, 2, 1)
+    listing = build_listing(args.days, args.omcs, args.slots, start)
+    arrivals = iter(build_listing(1, args.new * args.cycles, 1, start + timedelta(days=args.days)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = FileIndex(str(Path(tmp) / "index.db"))
+        full_bytes = 0
+        indexed_bytes = 0
+        filter_time = 0.0
+        for cycle in range(args.cycles):
+            listing.extend(next(arrivals) for _ in range(args.new))
+            full_bytes += len(json.dumps({"ndsId": 1, "data_type": "MRO", "file_paths": listing}).encode())
+
+            t0 = time.perf_counter()
+            unseen = await index.filter_unseen(1, "MRO", listing)
+            filter_time += time.perf_counter() - t0
+            if unseen:
+                indexed_bytes += len(json.dumps({"ndsId": 1, "data_type": "MRO", "file_paths": unseen}).encode())
+            await index.add(1, "MRO", unseen)
+            print(f"cycle {cycle + 1:>3}: listed={len(listing):>8} sent={len(unseen):>8}")
+
+        # 模拟重启后冷加载
+        index.close()
+        t0 = time.perf_counter()
+        index = FileIndex(str(Path(tmp) / "index.db"))
+        cold = len(await index.filter_unseen(1, "MRO", listing))
+        reload_time = time.perf_counter() - t0
+        stats = await index.stats()
+        index.close()
+
+    print()
+    print(f"full listing payload : {full_bytes / 1024 / 1024:10.2f} MB")
+    print(f"indexed payload      : {indexed_bytes / 1024 / 1024:10.2f} MB")
+    print(f"reduction            : {100 * (1 - indexed_bytes / full_bytes):10.2f} %")
+    print(f"filter time / cycle  : {1000 * filter_time / args.cycles:10.2f} ms")
+    print(f"restart reload       : {1000 * reload_time:10.2f} ms (unseen after restart: {cold})")
+    print(f"index size           : {stats['records']} records, {stats['size'] / 1024 / 1024:.2f} MB")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+JSON实现微基准测试
+
+以接近真实的 zip_info 响应(网关返回的WebSocket消息)和 batchAddTasks 批次为负载，
+比较标准库json、orjson、msgspec 的序列化和反序列化耗时。
+
+用法: python -m benchmarks.bench_json [--entries 2000] [--repeat 50]
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core import serialization
+
+
+def zip_info_message(entries: int) -> dict:
+    return {
+        "type": "response",
+        "code": 200,
+        "message": "success",
+        "request_id": "9f0c4f3e8a2b4c6d8e0f1a2b3c4d5e6f",
+        "data": [{
+            "file_name": f"FDD-LTE_MRO_ZTE_OMC1_{460000 + i}_20250208000000.xml",
+            "header_offset": 1542313 + i * 534019,
+            "compress_size": 534019,
+            "file_size": 4096000 + i,
+            "sub_file_name": "/MR/MRO/2025-02-08/FDD-LTE_MRO_ZTE_OMC1_20250208000000.zip",
+        } for i in range(entries)]
+    }
+
+
+def backends():
+    result = {"json": (
+        lambda obj: json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        json.loads
+    )}
+    if serialization.orjson is not None:
+        result["orjson"] = (serialization.orjson.dumps, serialization.orjson.loads)
+    if serialization.msgspec is not None:
+        encoder = serialization.msgspec.json.Encoder()
+        decoder = serialization.msgspec.json.Decoder()
+        result["msgspec"] = (encoder.encode, decoder.decode)
+    return result
+
+
+def timeit(func, arg, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=2000, help="每个压缩包的子文件数")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    message = zip_info_message(args.entries)
+    text = json.dumps(message, ensure_ascii=False)
+    records = [{**item, "ndsId": 1, "data_type": "MRO"} for item in message["data"]]
+    print(f"selected backend: {serialization.BACKEND}")
+    print(f"zip_info message: {len(text) / 1024:.1f} KB, {args.entries} entries")
+    print(f"{'backend':<8} {'loads zip_info':>16} {'dumps records':>15} {'MB/s loads':>11}")
+    for name, (dumpb, loads) in backends().items():
+        t_loads = timeit(loads, text, args.repeat)
+        t_dumps = timeit(dumpb, records, args.repeat)
+        print(f"{name:<8} {t_loads * 1000:>13.2f} ms {t_dumps * 1000:>12.2f} ms {len(text.encode()) / t_loads / 1024 / 1024:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+扫描器副本划分测试
+
+在本进程内启动替身网关和替身后端，另起多个扫描器副本进程(各自的app.id)，
+开启 scanner.partition 后依次模拟副本加入、离开，检查:
+- 每个NDS恰好由一个副本扫描(各副本的ndsLink ID不同，按NDS ID统计)
+- 每次变化只迁移必要的NDS(离开时只迁移离开副本的NDS，加入时约迁移 1/N)
+
+用法: python -m benchmarks.bench_partition [--replicas 3] [--nds 24]
+"""
+import sys
+import time
+import queue
+import asyncio
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+from typing import Dict, Set
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import config
+from app.utils.partition import assign
+from benchmarks.fake_gateway import FakeGateway
+from benchmarks.fake_backend import FakeBackend
+from benchmarks.nds_tree import TreeSpec, VirtualTree
+
+
+async def _replica(app_id: str, settings: Dict, reports, stop_event):
+    config.update({**settings, "app": {**settings.get("app", {}), "id": app_id}})
+    # Scanner 和模块级 Server 在导入时读取配置
+    from app.core.http_client import HttpClient
+    from app.services.scanner import Scanner, server
+
+    await server.register()
+    scanner = Scanner()
+    await scanner.start()
+    try:
+        while not stop_event.is_set():
+            reports.put((app_id, sorted(str(scanner._links[link_id]["nds"]["id"]) for link_id in scanner._tasks if link_id in scanner._links)))
+            await asyncio.sleep(0.2)
+    finally:
+        await scanner.stop()
+        scanner.file_index and scanner.file_index.close()
+        await server.unregister()
+        await HttpClient.close_shared()
+
+
+def replica_main(app_id: str, settings: Dict, reports, stop_event):
+    asyncio.run(_replica(app_id, settings, reports, stop_event))
+
+
+class Cluster:
+    def __init__(self, settings: Dict, nds_ids):
+        self.settings = settings
+        self.nds_ids = set(nds_ids)
+        self.context = multiprocessing.get_context("spawn")
+        self.reports = self.context.Queue()
+        self.replicas: Dict[str, tuple] = {}
+        self.owned: Dict[str, Set[str]] = {}
+
+    def add(self, app_id: str):
+        stop_event = self.context.Event()
+        process = self.context.Process(target=replica_main, args=(app_id, self.settings, self.reports, stop_event), daemon=True)
+        process.start()
+        self.replicas[app_id] = (process, stop_event)
+
+    async def remove(self, app_id: str):
+        process, stop_event = self.replicas.pop(app_id)
+        stop_event.set()
+        # 副本退出前要向本进程内的替身后端注销，不能阻塞事件循环
+        await asyncio.to_thread(process.join, 30)
+        self.owned.pop(app_id, None)
+
+    async def settle(self, timeout: float) -> Dict[str, str]:
+        """等待各副本的划分覆盖全部NDS且互不重叠，返回 {nds_id: 副本}"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                while True:
+                    app_id, tasks = self.reports.get_nowait()
+                    if app_id in self.replicas:
+                        self.owned[app_id] = set(tasks)
+            except queue.Empty:
+                pass
+            if set(self.owned) == set(self.replicas):
+                owners = [nds_id for tasks in self.owned.values() for nds_id in tasks]
+                # 每个NDS恰好一个归属副本: 不重复扫描，也没有无人扫描的NDS
+                if len(owners) == len(set(owners)) and set(owners) == self.nds_ids:
+                    return {nds_id: app_id for app_id, tasks in self.owned.items() for nds_id in tasks}
+            await asyncio.sleep(0.2)
+        raise RuntimeError(f"划分未在{timeout}s内收敛: {self.owned}")
+
+    async def stop(self):
+        await asyncio.gather(*[self.remove(app_id) for app_id in list(self.replicas)])
+
+
+def moved(before: Dict[str, str], after: Dict[str, str]) -> int:
+    return sum(1 for nds_id, app_id in after.items() if before.get(nds_id) != app_id)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--nds", type=int, default=24)
+    parser.add_argument("--interval", type=float, default=1, help="scanner.partition.interval")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--gateway-port", type=int, default=10106)
+    parser.add_argument("--backend-port", type=int, default=18091)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_partition_")
+    settings = {
+        "server.protocol": "http",
+        "server.host": "127.0.0.1",
+        "server.port": args.backend_port,
+        "scanner.min_interval": 1,
+        "scanner.max_interval": 5,
+        "scanner.schedule.start_jitter": 0,
+        "scanner.partition.enabled": True,
+        "scanner.partition.interval": args.interval,
+        "scanner.index.enabled": False,
+        "scanner.spool.path": f"{workdir}/spool",
+        "scanner.zip_info_cache.enabled": False,
+    }
+    for key, value in settings.items():
+        config.set(key, value, save=False)
+
+    tree = VirtualTree(TreeSpec(days=1, omcs=5, slots=2, entries=10))
+    gateway = FakeGateway(tree)
+    nds = [{
+        "id": i + 1,
+        "MRO_Path": "/MR/MRO/",
+        "MRO_Filter": r"MRO_.*\.zip$",
+        "MDT_Path": "/MR/MDT/",
+        "MDT_Filter": r"MDT_.*\.zip$",
+    } for i in range(args.nds)]
+    backend = FakeBackend(gateway={"id": 1, "host": "127.0.0.1", "port": args.gateway_port}, nds=nds)
+    await gateway.start(port=args.gateway_port)
+    await backend.start(port=args.backend_port)
+
+    nds_ids = [str(i + 1) for i in range(args.nds)]
+    cluster = Cluster(config.get_all(), nds_ids)
+
+    def report(step: str, before, after):
+        counts = {app_id: sum(1 for owner in after.values() if owner == app_id) for app_id in sorted(set(after.values()))}
+        expected = {app_id: len(keys) for app_id, keys in assign(nds_ids, list(cluster.replicas)).items()}
+        check = "一致" if counts == expected else f"与本地计算不一致 {expected}"
+        print(f"{step:<24} 迁移 {moved(before, after) if before else '-':>3}/{len(nds_ids)}  分布 {counts} {check}")
+
+    try:
+        for i in range(args.replicas):
+            cluster.add(f"scanner-{i + 1}")
+        current = await cluster.settle(args.timeout)
+        report(f"启动{args.replicas}个副本", None, current)
+
+        leaving = "scanner-2" if args.replicas >= 2 else "scanner-1"
+        expected_moves = sum(1 for owner in current.values() if owner == leaving)
+        await cluster.remove(leaving)
+        after = await cluster.settle(args.timeout)
+        report(f"{leaving}离开(应迁移{expected_moves})", current, after)
+        current = after
+
+        expected_moves = len(assign(nds_ids, [*cluster.replicas, "scanner-new"])["scanner-new"])
+        cluster.add("scanner-new")
+        after = await cluster.settle(args.timeout)
+        report(f"scanner-new加入(应迁移{expected_moves})", current, after)
+        print(f"后端收到子包记录: {backend.tasks}, filter请求: {backend.requests['filter']}")
+    finally:
+        await cluster.stop()
+        await backend.stop()
+        await gateway.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
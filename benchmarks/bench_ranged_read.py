@@ -0,0 +1,123 @@
+"""
+分段并发读取基准测试
+
+对替身网关比较单请求 Gateway.read 与按 part_size 拆分并发的 Gateway.read_ranged，
+在不同网关延迟下统计吞吐。--bandwidth 模拟网关读取NDS时单个请求的速率上限，
+这是分段并发主要想绕过的瓶颈。
+最后在传输中途取消落盘的分段读取，检查取消能正常传播、缓冲区映射能关闭、连接上不残留传输状态。
+
+用法: python -m benchmarks.bench_ranged_read [--size 64] [--bandwidth 50] [--latencies 0,0.01,0.05]
+"""
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import config
+from app.core.logger import log
+from app.utils.server import Gateway
+from benchmarks.fake_gateway import FakeGateway
+from benchmarks.nds_tree import TreeSpec, VirtualTree
+
+PATH = "/MR/MRO/2025-02-08/FDD-LTE_MRO_ZTE_OMC1_20250208000000.zip"
+
+
+def verify(data, offset: int) -> bool:
+    # VirtualTree 第n个字节为 n & 0xFF，抽查首尾和中间
+    size = len(data)
+    return all(data[i] == (offset + i) & 0xFF for i in (0, size // 3, size // 2, size - 1))
+
+
+async def check_cancel(client: Gateway, size: int, offset: int, delays):
+    """传输中途取消落盘的分段读取"""
+    warnings = []
+    sink = log.add(lambda message: warnings.append(message), level="WARNING",
+                   filter=lambda record: "缓冲区" in record["message"])
+    spill_threshold = config.get("gateway.read.spill_threshold", 64 * 1024 * 1024)
+    config.set("gateway.read.spill_threshold", 0, save=False)
+    try:
+        for delay in delays:
+            task = asyncio.create_task(client.read_ranged(1, PATH, offset, size, size // 8, 4))
+            await asyncio.sleep(delay)
+            finished = task.done()
+            task.cancel()
+            try:
+                response = await task
+                response.close()
+            except asyncio.CancelledError:
+                pass
+            leftover = sum(len(ws._file_transfers) + len(ws._destinations) for ws in client.ws_clients)
+            print(f"cancel after {delay:.3f}s: {'finished' if finished else 'cancelled'}, leftover transfers={leftover}")
+            if leftover or warnings:
+                raise RuntimeError(f"取消后未正确释放: leftover={leftover} warnings={warnings}")
+        # 取消后连接依然可用
+        response = await client.read_ranged(1, PATH, offset, size, size // 8, 4)
+        if getattr(response, "code", None) != 200 or not verify(response.Bytes, offset):
+            raise RuntimeError(f"取消后读取结果错误: {response}")
+        response.close()
+    finally:
+        config.set("gateway.read.spill_threshold", spill_threshold, save=False)
+        log.remove(sink)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=float, default=64, help="读取大小 MB")
+    parser.add_argument("--bandwidth", type=float, default=50, help="单个read请求的速率 MB/s，0为不限速")
+    parser.add_argument("--latencies", default="0,0.01,0.05")
+    parser.add_argument("--part-sizes", default="16,4", help="分段大小 MB")
+    parser.add_argument("--parallelism", default="1,4,8")
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--framed", action="store_true", help="网关使用分帧传输，同一连接上的分段可交错")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--port", type=int, default=10102)
+    args = parser.parse_args()
+
+    size = int(args.size * 1024 * 1024)
+    offset = 1542313
+    gateway = FakeGateway(
+        VirtualTree(TreeSpec()),
+        chunk_size=512 * 1024,
+        framed=args.framed,
+        bandwidth=args.bandwidth * 1024 * 1024 if args.bandwidth else None
+    )
+    await gateway.start(port=args.port)
+    client = Gateway({"host": "127.0.0.1", "port": args.port}, "bench", pool_size=args.pool_size)
+    await client.connect()
+
+    modes = [("read", None, None)]
+    for part in args.part_sizes.split(","):
+        for parallelism in args.parallelism.split(","):
+            modes.append((f"ranged {part}MB x{parallelism}", int(float(part) * 1024 * 1024), int(parallelism)))
+
+    print(f"size={args.size}MB per-request bandwidth={args.bandwidth or 'unlimited'}MB/s pool={args.pool_size} framed={args.framed}")
+    print(f"{'latency':>8} {'mode':<22} {'s/read':>8} {'MB/s':>8}")
+    try:
+        for latency in (float(value) for value in args.latencies.split(",")):
+            gateway.latency = latency
+            for name, part_size, parallelism in modes:
+                elapsed = 0.0
+                for _ in range(args.rounds):
+                    t0 = time.perf_counter()
+                    if part_size is None:
+                        response = await client.read(1, PATH, offset, size)
+                    else:
+                        response = await client.read_ranged(1, PATH, offset, size, part_size, parallelism)
+                    elapsed += time.perf_counter() - t0
+                    if getattr(response, "code", None) != 200 or len(response.Bytes) != size or not verify(response.Bytes, offset):
+                        raise RuntimeError(f"{name} 读取结果错误: {response}")
+                    response.close()
+                elapsed /= args.rounds
+                print(f"{latency:>8.3f} {name:<22} {elapsed:>8.3f} {size / elapsed / 1024 / 1024:>8.1f}")
+        print()
+        await check_cancel(client, size, offset, (0.0, 0.01, 0.05, 0.2))
+    finally:
+        await client.disconnect()
+        await gateway.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,151 @@
+"""
+端到端扫描吞吐基准测试
+
+在本进程内启动替身网关(FakeGateway + nds_tree 文件树)和替身后端(FakeBackend)，
+运行完整的 Scanner.start() -> scan_loop 流程，直到后端收到全部子包记录，
+统计文件/秒、记录/秒、峰值RSS以及各阶段的p99耗时。
+
+用法: python -m benchmarks.bench_scan_loop [--nds 2] [--days 2] [--omcs 50] [--entries 100]
+      [--gateway-latency 0.005] [--backend-latency 0] [--reject-rate 0.1]
+      [--root /tmp/nds | --manifest /tmp/nds.json] [--workers 4]
+
+--workers 大于0时由 ScanCoordinator 把NDS分片到多个工作进程扫描，峰值RSS只包含本进程。
+"""
+import sys
+import time
+import shutil
+import asyncio
+import logging
+import argparse
+import resource
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.core.config import config
+from benchmarks.fake_gateway import FakeGateway
+from benchmarks.nds_tree import TreeSpec, VirtualTree, load_tree
+from benchmarks.fake_backend import FakeBackend
+
+
+def peak_rss_mb() -> float:
+    # Linux 下 ru_maxrss 单位为KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nds", type=int, default=2)
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument("--omcs", type=int, default=50)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--entries", type=int, default=100, help="每个zip的子包数")
+    parser.add_argument("--root", help="使用 nds_tree 生成的磁盘文件树")
+    parser.add_argument("--manifest", help="使用 nds_tree 生成的虚拟清单")
+    parser.add_argument("--gateway-latency", type=float, default=0.005)
+    parser.add_argument("--backend-latency", type=float, default=0.0)
+    parser.add_argument("--reject-rate", type=float, default=0.0)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=16, help="scanner.zip_info_concurrency")
+    parser.add_argument("--workers", type=int, default=0, help="scanner.workers，0为单进程")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--gateway-port", type=int, default=10101)
+    parser.add_argument("--backend-port", type=int, default=18080)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    workdir = tempfile.mkdtemp(prefix="bench_scan_")
+    settings = {
+        "app.id": "bench",
+        "server.protocol": "http",
+        "server.host": "127.0.0.1",
+        "server.port": args.backend_port,
+        "gateway.pool_size": args.pool_size,
+        "scanner.zip_info_concurrency": args.concurrency,
+        "scanner.min_interval": 1,
+        "scanner.max_interval": 5,
+        "scanner.schedule.start_jitter": 0,
+        "scanner.incremental.enabled": False,
+        "scanner.index.path": f"{workdir}/nds_index.db",
+        "scanner.spool.path": f"{workdir}/spool",
+        "scanner.spool.backoff_min": 0.2,
+        "scanner.spool.backoff_max": 1,
+        "scanner.workers_report_interval": 1,
+    }
+    for key, value in settings.items():
+        config.set(key, value, save=False)
+
+    # Scanner 和模块级 Server 在导入时读取配置
+    from app.core.tracing import tracer
+    from app.services.scanner import Scanner, server
+    from app.services.coordinator import ScanCoordinator
+    from app.core.http_client import HttpClient
+    from app.core.metrics import registry
+
+    tree = load_tree(args.root, args.manifest, TreeSpec(days=args.days, omcs=args.omcs, slots=args.slots, entries=args.entries))
+    gateway = FakeGateway(tree, latency=args.gateway_latency)
+    nds = [{
+        "id": i + 1,
+        "MRO_Path": "/MR/MRO/",
+        "MRO_Filter": r"MRO_.*\.zip$",
+        "MDT_Path": "/MR/MDT/",
+        "MDT_Filter": r"MDT_.*\.zip$",
+    } for i in range(args.nds)]
+    backend = FakeBackend(
+        latency=args.backend_latency,
+        reject_rate=args.reject_rate,
+        gateway={"id": 1, "host": "127.0.0.1", "port": args.gateway_port},
+        nds=nds
+    )
+    await gateway.start(port=args.gateway_port)
+    await backend.start(port=args.backend_port)
+
+    files = len(tree.files) * args.nds
+    if isinstance(tree, VirtualTree):
+        expected = tree.spec.file_count * tree.spec.entries * args.nds
+    else:
+        expected = sum(len(tree.zip_info(None, path)) for path in tree.files) * args.nds
+    print(f"nds={args.nds} files={files} entries={expected} gateway_latency={args.gateway_latency}s reject_rate={args.reject_rate}")
+
+    scanner = ScanCoordinator(args.workers) if args.workers > 0 else Scanner()
+    t0 = time.perf_counter()
+    try:
+        if args.workers > 0:
+            await scanner.start(server)
+        else:
+            await scanner.start()
+        deadline = t0 + args.timeout
+        while backend.tasks < expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - t0
+        if args.workers > 0:
+            # 等工作进程上报最新的指标快照
+            await asyncio.sleep(1.5)
+            submitted = [line for line in registry.render().splitlines() if line.startswith("scanner_entries_submitted_total{")]
+    finally:
+        await scanner.stop()
+        if args.workers <= 0 and scanner.file_index:
+            scanner.file_index.close()
+        await HttpClient.close_shared()
+        await backend.stop()
+        await gateway.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    done = "" if backend.tasks >= expected else f" (超时，仅完成 {backend.tasks}/{expected})"
+    print(f"elapsed: {elapsed:.2f}s{done}")
+    print(f"files/s: {files / elapsed:,.0f}  entries/s: {backend.tasks / elapsed:,.0f}")
+    print(f"batches: {backend.requests['batchAddTasks']} rejected: {backend.rejected} gateway requests: {gateway.requests}")
+    print(f"peak RSS: {peak_rss_mb():.1f} MB")
+    if args.workers > 0:
+        for worker in scanner.status()["workers"]:
+            print(f"worker {worker['index']}: nds={worker['nds']} restarts={worker['restarts']}")
+        print("\n".join(submitted))
+        return
+    print(f"{'stage':<36} {'count':>8} {'avg ms':>10} {'p50 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    for name, stats in tracer.stats().items():
+        print(f"{name:<36} {stats['count']:>8} {stats['avg'] * 1000:>10.2f} {stats['p50'] * 1000:>10.2f} {stats['p99'] * 1000:>10.2f} {stats['max'] * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,54 @@
+"""
+文件名时间戳提取基准测试
+
+比较逐个文件 regex + strptime/strftime(Scanner._extract_time) 与
+extract_timestamps 对整个清单一次匹配的耗时，并校验两者结果一致。
+
+用法: python -m benchmarks.bench_timestamps [--files 200000]
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.timestamps import extract_timestamps, filter_window, newest_first, time_window
+from benchmarks.nds_tree import TreeSpec
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=200000)
+    args = parser.parse_args()
+
+    spec = TreeSpec(days=30, omcs=max(1, args.files // (30 * 4 * 2)))
+    paths = list(spec.files())[:args.files]
+
+    from app.services.scanner import Scanner
+    scanner = Scanner()
+    t0 = time.perf_counter()
+    per_item = [scanner._extract_time(path) for path in paths]
+    per_item_elapsed = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    timestamps = extract_timestamps(paths)
+    batch_elapsed = time.perf_counter() - t0
+    expected = [value.replace("-", "").replace(" ", "").replace(":", "") if value else "" for value in per_item]
+    if timestamps != expected:
+        raise RuntimeError("批量提取结果与逐个解析不一致")
+
+    oldest, newest = time_window(24 * 7, 60)
+    t0 = time.perf_counter()
+    kept, kept_timestamps, _, _ = filter_window(paths, timestamps, oldest, newest)
+    newest_first(kept, kept_timestamps)
+    window_elapsed = time.perf_counter() - t0
+
+    print(f"files={len(paths)}")
+    print(f"{'per-item strptime':<20} {per_item_elapsed * 1000:>8.0f} ms {per_item_elapsed / len(paths) * 1e6:>6.2f} us/file")
+    print(f"{'batch extract':<20} {batch_elapsed * 1000:>8.0f} ms {batch_elapsed / len(paths) * 1e6:>6.2f} us/file")
+    print(f"{'window + order':<20} {window_elapsed * 1000:>8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
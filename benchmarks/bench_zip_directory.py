@@ -0,0 +1,136 @@
+"""
+本地中央目录解析基准测试
+
+对磁盘文件树(nds_tree.generate 生成)比较网关 zip_info 与 Gateway.zip_directory
+(只读尾部，扫描器本地解析)的吞吐，并逐个校验两者结果一致。
+启动前先用 zipfile 构造带注释、UTF-8文件名和强制ZIP64的压缩包校验解析器。
+
+用法: python -m benchmarks.bench_zip_directory --root /tmp/nds [--latency 0.005] [--concurrency 16]
+"""
+import io
+import os
+import sys
+import time
+import asyncio
+import zipfile
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.server import Gateway
+from app.utils.zip_directory import read_zip_directory
+from benchmarks.fake_gateway import FakeGateway
+from benchmarks.nds_tree import DiskTree
+
+
+def _expected(data: bytes):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return [{
+            "file_name": info.filename,
+            "header_offset": info.header_offset,
+            "compress_size": info.compress_size,
+            "file_size": info.file_size,
+        } for info in zf.infolist()]
+
+
+async def check_parser():
+    cases = {}
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.comment = b"x" * 0xFFFF  # 最长注释，超出首次尾部读取长度
+        for i in range(50):
+            zf.writestr(f"小区_{i}.xml", os.urandom(100) * 10)
+    cases["comment+utf8"] = buffer.getvalue()
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zf:
+        for i in range(3000):
+            with zf.open(f"entry_{i}.xml", "w", force_zip64=True) as f:
+                f.write(b"<v/>")
+    cases["zip64 entries"] = buffer.getvalue()
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr("big.bin", b"\0" * 1024)
+        for i in range(70000):  # 条目数超过0xFFFF，写入ZIP64 EOCD
+            zf.writestr(f"e{i}", b"")
+    cases["zip64 eocd"] = buffer.getvalue()
+
+    for name, data in cases.items():
+        reads = []
+
+        async def read(offset: int, size: int) -> bytes:
+            reads.append(size)
+            return data[offset:offset + size]
+
+        entries = await read_zip_directory(read, len(data))
+        if entries != _expected(data):
+            raise RuntimeError(f"{name} 解析结果与zipfile不一致")
+        print(f"parser ok: {name:<14} entries={len(entries):>6} reads={len(reads)} bytes={sum(reads):,}")
+
+
+async def run(client: Gateway, tree: DiskTree, paths, sizes, local: bool, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+
+    async def one(path: str):
+        async with semaphore:
+            if local:
+                response = await client.zip_directory(1, path, sizes[path])
+            else:
+                response = await client.zip_info(1, path)
+        if getattr(response, "code", None) != 200:
+            raise RuntimeError(f"{path}: {response}")
+        results[path] = response.data
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[one(path) for path in paths])
+    return time.perf_counter() - t0, results
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", required=True, help="nds_tree 生成的磁盘文件树")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--port", type=int, default=10103)
+    args = parser.parse_args()
+
+    await check_parser()
+
+    tree = DiskTree(args.root)
+    paths = tree.files[:args.files]
+    sizes = {path: os.path.getsize(tree._local(path)) for path in paths}
+    gateway = FakeGateway(tree, latency=args.latency)
+    reads = {"bytes": 0}
+    tree_read = tree.read
+
+    def counted_read(nds_id, path, offset, size):
+        data = tree_read(nds_id, path, offset, size)
+        reads["bytes"] += len(data)
+        return data
+
+    tree.read = counted_read
+    await gateway.start(port=args.port)
+    client = Gateway({"host": "127.0.0.1", "port": args.port}, "bench", pool_size=args.pool_size)
+    await client.connect()
+    try:
+        print(f"files={len(paths)} avg size={sum(sizes.values()) / len(paths) / 1024:.0f}KB latency={args.latency}s concurrency={args.concurrency}")
+        print(f"{'engine':<8} {'elapsed s':>10} {'files/s':>10} {'bytes read':>14}")
+        baseline = None
+        for engine in ("gateway", "local"):
+            reads["bytes"] = 0
+            elapsed, results = await run(client, tree, paths, sizes, engine == "local", args.concurrency)
+            if baseline is None:
+                baseline = results
+            elif results != baseline:
+                raise RuntimeError("本地解析结果与网关zip_info不一致")
+            print(f"{engine:<8} {elapsed:>10.2f} {len(paths) / elapsed:>10,.0f} {reads['bytes']:>14,}")
+    finally:
+        await client.disconnect()
+        await gateway.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+"""
+本地替身后端
+
+实现扫描器用到的后端接口，统计收到的请求数、线上字节数和解压后字节数，
+支持模拟延迟、带宽和429拒绝，供基准测试使用。
+"""
+import gzip
+import json
+import random
+import asyncio
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class FakeBackend:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        bandwidth: Optional[float] = None,
+        reject_rate: float = 0.0,
+        gateway: Optional[Dict[str, Any]] = None,
+        nds: Optional[List[Dict[str, Any]]] = None
+    ):
+        """
+        :param latency: 每个请求的附加延迟(秒)
+        :param bandwidth: 模拟上行带宽(字节/秒)，为空时不限速
+        :param reject_rate: batchAddTasks 返回429的概率
+        :param gateway: 分配给扫描器的网关，如 {"id": 1, "host": "127.0.0.1", "port": 10101}
+        :param nds: 分配给扫描器的NDS配置列表
+        """
+        self.gateway = gateway
+        self.nds = nds or []
+        self.scanners: Dict[str, Dict[str, Any]] = {}
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.reject_rate = reject_rate
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.wire_bytes: Dict[str, int] = defaultdict(int)
+        self.raw_bytes: Dict[str, int] = defaultdict(int)
+        self.tasks = 0  # 成功写入的子包记录数
+        self.rejected = 0
+        self.known: Dict[Tuple[str, str], Set[str]] = defaultdict(set)
+        self.app = FastAPI()
+        self._server: Optional[uvicorn.Server] = None
+        self._task: Optional[asyncio.Task] = None
+        self._routes()
+
+    async def _read_json(self, name: str, request: Request) -> Any:
+        body = await request.body()
+        wire = len(body)
+        self.requests[name] += 1
+        self.wire_bytes[name] += wire
+        encoding = request.headers.get("content-encoding")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "zstd":
+            body = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+        self.raw_bytes[name] += len(body)
+        delay = self.latency
+        if self.bandwidth:
+            delay += wire / self.bandwidth
+        if delay:
+            await asyncio.sleep(delay)
+        return json.loads(body)
+
+    def _links(self, scanner_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """与真实后端一致，每个扫描器和NDS的组合对应一条ndsLink，不同扫描器的ndsLink ID不同"""
+        base = (list(self.scanners).index(scanner_id) + 1) * 10000 if scanner_id in self.scanners else 0
+        return [{"id": base + i + 1, "nds": nds} for i, nds in enumerate(self.nds)]
+
+    def _routes(self):
+        @self.app.post("/api/scanner/register")
+        async def scanner_register(request: Request):
+            data = await request.json()
+            self.requests["register"] += 1
+            scanner = self.scanners.setdefault(str(data["id"]), {"id": str(data["id"]), "name": f"Scanner-{data['id']}"})
+            scanner.update({"port": data.get("port"), "status": 1, "gatewayId": (self.gateway or {}).get("id")})
+            return {"code": 200, "data": scanner, "message": "success"}
+
+        @self.app.get("/api/scanner/list")
+        async def scanner_list():
+            self.requests["list"] += 1
+            return {"code": 200, "data": list(self.scanners.values()), "message": "success"}
+
+        @self.app.get("/api/scanner/{scanner_id}")
+        async def scanner_info(scanner_id: str):
+            self.requests["info"] += 1
+            scanner = self.scanners.get(scanner_id, {"id": scanner_id})
+            return {"code": 200, "data": {**scanner, "gateway": self.gateway, "ndsLinks": self._links(scanner_id)}, "message": "success"}
+
+        @self.app.put("/api/scanner/{scanner_id}")
+        async def scanner_update(scanner_id: str, request: Request):
+            data = await request.json()
+            scanner = self.scanners.setdefault(scanner_id, {"id": scanner_id})
+            scanner.update(data)
+            return {"code": 200, "data": scanner, "message": "success"}
+
+        @self.app.get("/api/gateway/{gateway_id}")
+        async def gateway_info(gateway_id: str):
+            return {"code": 200, "data": {**(self.gateway or {}), "ndsLinks": self._links()}, "message": "success"}
+
+        @self.app.post("/api/ndsfiles/filter")
+        async def ndsfiles_filter(request: Request):
+            data = await self._read_json("filter", request)
+            known = self.known[(str(data["ndsId"]), data["data_type"])]
+            new_files = [path for path in data["file_paths"] if path not in known]
+            known.update(new_files)
+            return {"code": 200, "data": new_files, "message": "success"}
+
+        @self.app.post("/api/ndsfiles/batchAddTasks")
+        async def batch_add_tasks(request: Request):
+            tasks = await self._read_json("batchAddTasks", request)
+            if self.reject_rate and random.random() < self.reject_rate:
+                self.rejected += 1
+                return {"code": 429, "data": None, "message": "redis高负荷"}
+            self.tasks += len(tasks)
+            return {"code": 200, "data": len(tasks), "message": "success"}
+
+    async def start(self, host: str = "127.0.0.1", port: int = 18080):
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning", lifespan="off"))
+        self._task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            await asyncio.sleep(0.01)
+
+    async def stop(self):
+        if self._server:
+            self._server.should_exit = True
+            await self._task
@@ -0,0 +1,138 @@
+"""
+本地替身网关
+
+实现网关WebSocket协议的 scan / zip_info / read / check_connection 接口，
+read 按 file start -> 二进制分块 -> file end -> response 的顺序返回数据。
+文件数据来自 tree 对象，需要实现:
+    list(nds_id, path, pattern) -> List[str]
+    zip_info(nds_id, path) -> List[dict]
+    read(nds_id, path, offset, size) -> bytes
+benchmarks.nds_tree 中的 VirtualTree / DiskTree 均可直接使用。
+
+单独运行: python -m benchmarks.fake_gateway [--root /tmp/nds | --manifest /tmp/nds.json] [--port 10101]
+"""
+import sys
+import json
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import websockets
+
+
+class FakeGateway:
+    def __init__(self, tree, latency: float = 0.0, chunk_size: int = 64 * 1024, framed: bool = False, bandwidth: Optional[float] = None):
+        """
+        :param tree: 文件数据来源
+        :param latency: 每个请求的附加延迟(秒)
+        :param bandwidth: 单个read请求的传输速率(字节/秒)，模拟网关读取NDS的单流吞吐，为空时不限速
+        :param chunk_size: read 响应的二进制分块大小
+        :param framed: read 响应是否使用带request_id前缀的分帧格式
+        """
+        self.tree = tree
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.framed = framed
+        self.bandwidth = bandwidth
+        self.requests: Dict[str, int] = {}
+        self.connections = 0
+        self._server = None
+
+    async def _throttle(self, size: int):
+        if self.bandwidth:
+            await asyncio.sleep(size / self.bandwidth)
+
+    async def _send_file(self, ws, request_id: str, data: bytes, lock: asyncio.Lock):
+        if self.framed:
+            header = request_id.encode()
+            await ws.send(json.dumps({"type": "file", "data": "start", "request_id": request_id, "framed": True}))
+            for i in range(0, len(data), self.chunk_size):
+                await self._throttle(min(self.chunk_size, len(data) - i))
+                await ws.send(header + data[i:i + self.chunk_size])
+            await ws.send(json.dumps({"type": "file", "data": "end", "request_id": request_id}))
+            return
+        # 未分帧时同一连接上的文件传输不能交错
+        async with lock:
+            await ws.send(json.dumps({"type": "file", "data": "start", "request_id": request_id}))
+            for i in range(0, len(data), self.chunk_size):
+                await self._throttle(min(self.chunk_size, len(data) - i))
+                await ws.send(data[i:i + self.chunk_size])
+            await ws.send(json.dumps({"type": "file", "data": "end", "request_id": request_id}))
+
+    async def _handle(self, ws, request: Dict[str, Any], lock: asyncio.Lock):
+        api = request.get("api")
+        request_id = request.get("request_id")
+        params = request.get("params") or {}
+        self.requests[api] = self.requests.get(api, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        try:
+            if api == "scan":
+                data = self.tree.list(params.get("nds_id"), params.get("path"), params.get("filter"))
+            elif api == "zip_info":
+                data = self.tree.zip_info(params.get("nds_id"), params.get("path"))
+            elif api == "read":
+                content = self.tree.read(params.get("nds_id"), params.get("path"), int(params.get("header_offset")), int(params.get("size")))
+                await self._send_file(ws, request_id, content, lock)
+                data = None
+            else:
+                raise ValueError(f"未知接口: {api}")
+            await ws.send(json.dumps({"type": "response", "code": 200, "message": "success", "data": data, "request_id": request_id}))
+        except Exception as e:
+            await ws.send(json.dumps({"type": "error", "code": 500, "message": str(e), "request_id": request_id}))
+
+    async def _connection(self, ws, path: str = None):
+        self.connections += 1
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            async for message in ws:
+                request = json.loads(message)
+                if request.get("api") == "check_connection":
+                    self.requests["check_connection"] = self.requests.get("check_connection", 0) + 1
+                    continue
+                task = asyncio.create_task(self._handle(ws, request, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 10101):
+        self._server = await websockets.serve(self._connection, host, port, max_size=None)
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", help="DiskTree 根目录")
+    parser.add_argument("--manifest", help="VirtualTree 清单文件")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=10101)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--framed", action="store_true")
+    parser.add_argument("--bandwidth", type=float, default=None, help="单个read请求的速率 MB/s")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from benchmarks.nds_tree import load_tree
+
+    gateway = FakeGateway(load_tree(args.root, args.manifest), latency=args.latency, framed=args.framed,
+                          bandwidth=args.bandwidth * 1024 * 1024 if args.bandwidth else None)
+    await gateway.start(args.host, args.port)
+    print(f"fake gateway listening on ws://{args.host}:{args.port}/v1/nds/ws/")
+    try:
+        await asyncio.Future()
+    finally:
+        await gateway.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+本地替身SFTP服务器
+
+基于asyncssh，以root目录为根对外提供SFTP，供直连列表(scanner.direct)测试和基准测试使用。
+root 通常为 benchmarks.nds_tree 生成的磁盘文件树。
+
+单独运行: python -m benchmarks.fake_sftp --root /tmp/nds [--port 10022] [--username nds --password nds]
+"""
+import asyncio
+import argparse
+from typing import Optional
+
+import asyncssh
+
+
+class FakeSftpServer:
+    def __init__(self, root: str, username: str = "nds", password: str = "nds", latency: float = 0.0):
+        """
+        :param root: 对外提供的根目录
+        :param latency: 每次目录读取的附加延迟(秒)，模拟NDS的往返时延
+        """
+        self.root = root
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.readdirs = 0
+        self.host_key = asyncssh.generate_private_key("ssh-ed25519")
+        self._server: Optional[asyncssh.SSHAcceptor] = None
+
+    def _server_factory(self):
+        owner = self
+
+        class _Server(asyncssh.SSHServer):
+            def begin_auth(self, username: str) -> bool:
+                return True
+
+            def password_auth_supported(self) -> bool:
+                return True
+
+            def validate_password(self, username: str, password: str) -> bool:
+                return username == owner.username and password == owner.password
+
+        return _Server()
+
+    def _sftp_factory(self, chan):
+        owner = self
+
+        class _SFTPServer(asyncssh.SFTPServer):
+            def __init__(self, chan):
+                super().__init__(chan, chroot=owner.root.encode())
+
+            async def scandir(self, path: bytes):
+                owner.readdirs += 1
+                if owner.latency:
+                    await asyncio.sleep(owner.latency)
+                async for name in super().scandir(path):
+                    yield name
+
+        return _SFTPServer(chan)
+
+    def write_known_hosts(self, path: str, host: str = "127.0.0.1", port: int = 10022) -> str:
+        """把主机公钥写入known_hosts文件，供客户端校验主机密钥，返回文件路径"""
+        public_key = self.host_key.export_public_key().decode().strip()
+        with open(path, "w") as f:
+            f.write(f"[{host}]:{port} {public_key}\n")
+        return path
+
+    async def start(self, host: str = "127.0.0.1", port: int = 10022):
+        self._server = await asyncssh.listen(
+            host, port,
+            server_host_keys=[self.host_key],
+            server_factory=self._server_factory,
+            sftp_factory=self._sftp_factory
+        )
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=10022)
+    parser.add_argument("--username", default="nds")
+    parser.add_argument("--password", default="nds")
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeSftpServer(args.root, args.username, args.password, args.latency)
+    await server.start(args.host, args.port)
+    print(f"fake sftp listening on {args.host}:{args.port}, root={args.root}")
+    try:
+        await asyncio.Future()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
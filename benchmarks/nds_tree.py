@@ -0,0 +1,253 @@
+"""
+合成NDS文件树
+
+按天分区生成MRO/MDT文件树，文件名与线上一致，能被 MRO_Filter / MDT_Filter 匹配:
+    /MR/MRO/2025-02-08/FDD-LTE_MRO_ZTE_OMC1_20250208000000.zip
+zip内子包命名为 FDD-LTE_MRO_ZTE_OMC1_460001_20250208000000.xml。
+
+- VirtualTree: 只由 TreeSpec 描述的虚拟清单，列表、zip_info、read 均按规则即时计算，
+  适合 30天 x 500 OMC 这类大规模场景
+- DiskTree: 本地磁盘上的真实zip文件，由 generate() 生成，zip_info 读取真实中央目录
+
+两者都实现替身网关需要的 list / zip_info / read 接口。
+
+用法:
+    python -m benchmarks.nds_tree --root /tmp/nds --days 30 --omcs 500 --entries 2000
+    python -m benchmarks.nds_tree --manifest /tmp/nds.json --days 30 --omcs 500
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import zipfile
+import argparse
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+MANIFEST_NAME = "manifest.json"
+_LOCAL_HEADER_SIZE = 30
+
+
+@dataclass
+class TreeSpec:
+    days: int = 2
+    omcs: int = 50
+    slots: int = 4  # 每天的文件时间点数，间隔 slot_minutes
+    slot_minutes: int = 15
+    entries: int = 100  # 每个zip的子包数
+    entry_size: int = 4096  # 子包平均解压后大小
+    start: str = "2025-02-08"
+    root: str = "/MR"
+    technology: str = "FDD-LTE"
+    vendors: List[str] = field(default_factory=lambda: ["ZTE", "HW", "ERI"])
+    data_types: List[str] = field(default_factory=lambda: ["MRO", "MDT"])
+
+    @classmethod
+    def load(cls, path: str) -> "TreeSpec":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+
+    @property
+    def file_count(self) -> int:
+        return len(self.data_types) * self.days * self.slots * self.omcs
+
+    def day_dirs(self, data_type: str) -> Iterator[Tuple[datetime, str]]:
+        start = datetime.strptime(self.start, "%Y-%m-%d")
+        for d in range(self.days):
+            day = start + timedelta(days=d)
+            yield day, f"{self.root}/{data_type}/{day:%Y-%m-%d}/"
+
+    def day_files(self, data_type: str, day: datetime) -> List[str]:
+        """某一天分区下的文件名(不含目录)"""
+        names = []
+        for slot in range(self.slots):
+            ts = (day + timedelta(minutes=self.slot_minutes * slot)).strftime("%Y%m%d%H%M%S")
+            for omc in range(1, self.omcs + 1):
+                vendor = self.vendors[omc % len(self.vendors)]
+                names.append(f"{self.technology}_{data_type}_{vendor}_OMC{omc}_{ts}.zip")
+        return names
+
+    def files(self) -> Iterator[str]:
+        for data_type in self.data_types:
+            for day, directory in self.day_dirs(data_type):
+                for name in self.day_files(data_type, day):
+                    yield directory + name
+
+    def entries_of(self, path: str) -> List[Tuple[str, int, int]]:
+        """zip内的子包 [(文件名, 压缩后大小, 解压后大小)]，大小按文件路径确定性浮动"""
+        stem = path.rsplit("/", 1)[-1][:-4]
+        prefix, ts = stem.rsplit("_", 1)
+        seed = zlib.crc32(path.encode())
+        result = []
+        for i in range(self.entries):
+            h = (seed * 2654435761 + i * 40503) & 0xFFFFFFFF
+            file_size = max(64, self.entry_size // 2 + h % self.entry_size)
+            result.append((f"{prefix}_{460001 + i}_{ts}.xml", file_size // 8 + 32, file_size))
+        return result
+
+
+class VirtualTree:
+    """按 TreeSpec 即时计算的虚拟文件树，不占用磁盘"""
+
+    def __init__(self, spec: TreeSpec):
+        self.spec = spec
+        self._dirs: Dict[str, Tuple[str, datetime]] = {}
+        for data_type in spec.data_types:
+            for day, directory in spec.day_dirs(data_type):
+                self._dirs[directory] = (data_type, day)
+
+    @property
+    def files(self) -> List[str]:
+        return list(self.spec.files())
+
+    def list(self, nds_id, path: str, pattern: Optional[str]) -> List[str]:
+        regex = re.compile(pattern) if pattern else None
+        result = []
+        for directory, (data_type, day) in self._dirs.items():
+            if not (directory.startswith(path) or path.startswith(directory)):
+                continue
+            for name in self.spec.day_files(data_type, day):
+                file = directory + name
+                if file.startswith(path) and (regex is None or regex.search(file)):
+                    result.append(file)
+        return result
+
+    def zip_info(self, nds_id, path: str) -> List[Dict[str, Any]]:
+        result = []
+        offset = 0
+        for name, compress_size, file_size in self.spec.entries_of(path):
+            result.append({
+                "file_name": name,
+                "header_offset": offset,
+                "compress_size": compress_size,
+                "file_size": file_size,
+                "sub_file_name": path,
+            })
+            offset += _LOCAL_HEADER_SIZE + len(name) + compress_size
+        return result
+
+    def read(self, nds_id, path: str, offset: int, size: int) -> bytes:
+        # 第n个字节的值为 n & 0xFF，便于校验分段读取的拼接结果
+        start = offset % 256
+        return (bytes(range(256)) * (size // 256 + 2))[start:start + size]
+
+
+class DiskTree:
+    """磁盘上的真实文件树，路径相对于 root"""
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _local(self, path: str) -> str:
+        local = os.path.abspath(os.path.join(self.root, path.lstrip("/")))
+        if not local.startswith(self.root):
+            raise ValueError(f"路径越界: {path}")
+        return local
+
+    @property
+    def files(self) -> List[str]:
+        return self.list(None, "/", None)
+
+    def list(self, nds_id, path: str, pattern: Optional[str]) -> List[str]:
+        regex = re.compile(pattern) if pattern else None
+        result = []
+        for directory, _, names in os.walk(self._local(path)):
+            relative = os.path.relpath(directory, self.root)
+            prefix = "" if relative == "." else "/" + relative.replace(os.sep, "/")
+            for name in names:
+                file = f"{prefix}/{name}"
+                if name.endswith(".zip") and (regex is None or regex.search(file)):
+                    result.append(file)
+        return result
+
+    def zip_info(self, nds_id, path: str) -> List[Dict[str, Any]]:
+        with zipfile.ZipFile(self._local(path)) as zf:
+            return [{
+                "file_name": info.filename,
+                "header_offset": info.header_offset,
+                "compress_size": info.compress_size,
+                "file_size": info.file_size,
+                "sub_file_name": path,
+            } for info in zf.infolist()]
+
+    def read(self, nds_id, path: str, offset: int, size: int) -> bytes:
+        with open(self._local(path), "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+
+def _entry_content(name: str, size: int) -> bytes:
+    # 类XML的重复内容，压缩率与真实MR文件接近
+    row = f'<v>{name} 1 2 3 -110 -95 12 0 NIL 460 01</v>\n'.encode()
+    return (b"<?xml version=\"1.0\"?>\n" + row * (size // len(row) + 1))[:size]
+
+
+def _write_day(spec: TreeSpec, root: str, data_type: str, day: datetime, directory: str) -> int:
+    local_dir = os.path.join(root, directory.lstrip("/"))
+    os.makedirs(local_dir, exist_ok=True)
+    for name in spec.day_files(data_type, day):
+        path = directory + name
+        with zipfile.ZipFile(os.path.join(local_dir, name), "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+            for entry, _, file_size in spec.entries_of(path):
+                zf.writestr(entry, _entry_content(entry, file_size))
+    return spec.slots * spec.omcs
+
+
+def generate(spec: TreeSpec, root: str, workers: Optional[int] = None) -> DiskTree:
+    """在root下生成真实zip文件树，并写入 manifest.json 记录生成参数"""
+    os.makedirs(root, exist_ok=True)
+    jobs = [(data_type, day, directory) for data_type in spec.data_types for day, directory in spec.day_dirs(data_type)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_write_day, spec, root, *job) for job in jobs]
+        done = 0
+        for future in futures:
+            done += future.result()
+            print(f"\r{done}/{spec.file_count} files", end="", file=sys.stderr)
+    print(file=sys.stderr)
+    spec.save(os.path.join(root, MANIFEST_NAME))
+    return DiskTree(root)
+
+
+def load_tree(root: Optional[str] = None, manifest: Optional[str] = None, spec: Optional[TreeSpec] = None):
+    """按参数加载文件树: root 为磁盘目录，manifest 为虚拟清单文件，否则使用spec生成虚拟树"""
+    if root:
+        return DiskTree(root)
+    if manifest:
+        return VirtualTree(TreeSpec.load(manifest))
+    return VirtualTree(spec or TreeSpec())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--root", help="生成真实zip文件的目录")
+    target.add_argument("--manifest", help="只写出虚拟清单文件")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--omcs", type=int, default=500)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--entries", type=int, default=1000)
+    parser.add_argument("--entry-size", type=int, default=4096)
+    parser.add_argument("--start", default="2025-02-08")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    spec = TreeSpec(days=args.days, omcs=args.omcs, slots=args.slots, entries=args.entries, entry_size=args.entry_size, start=args.start)
+    if args.manifest:
+        spec.save(args.manifest)
+        print(f"manifest: {args.manifest}, {spec.file_count} files x {spec.entries} entries")
+        return
+    t0 = time.perf_counter()
+    generate(spec, args.root, args.workers)
+    print(f"generated {spec.file_count} files x {spec.entries} entries in {time.perf_counter() - t0:.1f}s under {args.root}")
+
+
+if __name__ == "__main__":
+    main()